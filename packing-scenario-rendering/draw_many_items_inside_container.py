@@ -1,10 +1,14 @@
 import BlenderToolBox as bt
 import numpy as np
 import os
+import sys
 import transforms3d
 import trimesh
 from allColor import allColor
 import bpy
+sys.path.append('../packing-shape-processing')
+from pipeline.catalog import ShapeCatalog
+from pipeline.heightmaps import shapeName
 
 selectedColor = [allColor[35],
                  allColor[28],
@@ -31,6 +35,8 @@ selected = [336, 361, 381, 511, 782, 948, 1144, 1246, 1256, 1369, 1428, 1521, 17
 folder = 'tetrisInContainer'
 dataPath = './dynamicsData/trajsTetris.npy'
 trajs = np.load(dataPath, allow_pickle=True)
+catalogPath = None # shape catalog of packing-shape-processing (3_9_shape_catalog.py), item meshes are then read from it
+catalog = ShapeCatalog(catalogPath) if catalogPath is not None else None
 
 for trajIdx in range(len(trajs)):
     meshInputPath = './meshes/packing/{}'.format(taskName)
@@ -68,7 +74,10 @@ for trajIdx in range(len(trajs)):
         positionT, orientationT = item[2:]
         positionT = np.array(positionT)  # xyzw
         meshFile = os.path.join(meshInputPath, name)
-        mesh = trimesh.load_mesh(meshFile)
+        if catalog is not None and shapeName(name) in catalog:
+            mesh = catalog.mesh(shapeName(name))
+        else:
+            mesh = trimesh.load_mesh(meshFile)
         mesh.apply_transform(extendMat(transforms3d.quaternions.quat2mat([orientationT[3], *orientationT[0:3]])))
         mesh.apply_translation(-mesh.bounds[0])
         mesh.apply_translation(positionT)
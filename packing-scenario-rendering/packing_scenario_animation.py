@@ -7,6 +7,10 @@ import BlenderToolBox as bt
 import bpy
 import transforms3d
 from allColor import allColor
+sys.path.append('../packing-shape-processing')
+from pipeline.stablePoses import stablePoses
+from pipeline.catalog import ShapeCatalog, exportShape
+from pipeline.heightmaps import shapeName
 
 selectedColor = [allColor[35], # yellow
                  allColor[0], # derekBlue
@@ -146,6 +150,16 @@ baserotation = np.array(baserotation)
 
 meshList = os.listdir(meshOutputPath)
 
+catalogPath = None # shape catalog of packing-shape-processing (3_9_shape_catalog.py), item meshes are then read from it
+catalog = ShapeCatalog(catalogPath) if catalogPath is not None else None
+
+def catalogMesh(meshPath):
+    # Blender reads files, so a catalog mesh is written out once under meshOutputPath/catalogParts.
+    name = shapeName(meshPath)
+    if catalog is None or name not in catalog:
+        return meshPath
+    return exportShape(catalog, name, os.path.join(meshOutputPath, 'catalogParts', name + '.obj'))
+
 originMat = extendMat(transforms3d.euler.euler2mat(*(baserotation/180 * np.pi)), baseposition)
 trajPosesSchedule = np.load('./dynamicsData/robotPosesTetris.npy', allow_pickle=True)
 trajPoses = []
@@ -173,7 +187,7 @@ shapeonbelt = [
                ]
 
 for i in range(len(shapeonbelt)):
-    shapeonbelt[i] = os.path.join(objectMeshDir, shapeonbelt[i])
+    shapeonbelt[i] = catalogMesh(os.path.join(objectMeshDir, shapeonbelt[i]))
 
 shapeonbelt.insert(0, os.path.join(meshOutputPath,
                                    'tetrisForAnimationHand.obj'))
@@ -192,7 +206,7 @@ thick = 0.01
 
 for idx, meshonbeltName in enumerate(shapeonbelt):
     meshonbelt = trimesh.load(meshonbeltName)
-    transforms, _ = meshonbelt.compute_stable_poses()
+    transforms, _ = stablePoses(meshonbelt, cacheDir='./meshes/stable_pose_cache')
     eye = np.eye(3)
     drawMat = transforms[0]
 
@@ -211,7 +225,7 @@ for idx, meshonbeltName in enumerate(shapeonbelt):
 objectMeshDir = './meshes/packing/tetris3D_for_animation'
 incontainerPathList, initList, incontainerTrajList = np.load('./dynamicsData/incontainerDynamicsTetris.npy', allow_pickle=True)
 for idx, name in enumerate(incontainerPathList):
-    incontainerPathList[idx] = os.path.join(objectMeshDir, name)
+    incontainerPathList[idx] = catalogMesh(os.path.join(objectMeshDir, name))
 incontainerPathList.append(os.path.join(meshOutputPath, 'robotParts', 'tetrisForAnimationT.obj'))
 if True:
     robotPathList = []
@@ -1,14 +1,27 @@
 import os
-import trimesh
+from pipeline.meshio import convertFile, convertTree, treePairs
 
 # Turn the mesh files into off format for the next step (reconstruction)
+# The files are parsed straight into arrays and written back as off (pipeline/meshio.py), no trimesh objects are built.
+# Sub folders of source are mirrored under target.
 source = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/1_sort/0_ycb_obj'
 target = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/1_sort/1_ycb_off'
 
-if not os.path.exists(target):
-    os.makedirs(target)
+def prepare():
+    for _, targetPath in treePairs(source, target, '.off'):
+        os.makedirs(os.path.dirname(targetPath), exist_ok=True)
 
-for item in os.listdir(source):
-    itemPath = os.path.join(source, item)
-    mesh = trimesh.load(itemPath)
-    mesh.export(os.path.join(target, item.replace('.obj', '.off')))
\ No newline at end of file
+def listItems():
+    return [os.path.relpath(sourcePath, source) for sourcePath, _ in treePairs(source, target, '.off')]
+
+def itemInputs(item):
+    return [os.path.join(source, item)]
+
+def itemOutputs(item):
+    return [os.path.join(target, os.path.splitext(item)[0] + '.off')]
+
+def processItem(item):
+    convertFile(itemInputs(item)[0], itemOutputs(item)[0])
+
+if __name__ == '__main__':
+    convertTree(source, target, '.off')
@@ -1,11 +1,24 @@
 import os
-import trimesh
+from pipeline.audit import auditMesh, writeReport
 
 # Check if all the meshes are watertight.
+# Every mesh is checked on its raw arrays (edge-manifold test), the results go to a columnar report
+# (name, watertight, genus, face count, volume) that later stages can filter on without reloading meshes.
 
 source = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/1_sort/1_ycb_off'
-for f in os.listdir(source):
-    print(f)
-    mesh = trimesh.load_mesh(os.path.join(source,f))
-    print(mesh.is_watertight)
+reportPath = source.rstrip('/') + '_audit.npz'
 
+def listItems():
+    return os.listdir(source)
+
+def processItem(f):
+    row = auditMesh(os.path.join(source,f))
+    print(f, row[1])
+    return row
+
+def finish(items, results):
+    writeReport(reportPath, results)
+
+if __name__ == '__main__':
+    items = listItems()
+    finish(items, [processItem(f) for f in items])
@@ -1,16 +1,50 @@
-# commands
+import os
+import trimesh
+from pipeline.meshio import readMesh
+from pipeline.fusion import reconstruct
+
+# Watertight reconstruction of the converted meshes.
+# Same recipe as mesh-fusion (https://github.com/autonomousvision/occupancy_networks/tree/master/external/mesh-fusion):
+# scale into the unit cube, render depth maps from views around the mesh, fuse them into a TSDF, marching cubes.
+# Everything happens in memory, one mesh per task, so no scaled meshes or depth maps are written in between.
+# The result is brought back to the coordinates of the input mesh; decimation is left to 3_1.
 dataName = 'ycb'
+source = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/1_sort/1_{}_off'.format(dataName)
+target = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/3_{}_obj_out'.format(dataName)
+
+resolution = 128 # voxels along each side of the unit cube
+views = 100
+truncation = 10 # in voxels
+padding = 0.1
+keepLargest = True # drop the small shells carved out through holes of the input
+stageParams = {'resolution': resolution, 'views': views, 'truncation': truncation, 'padding': padding, 'keepLargest': keepLargest}
+
+def prepare():
+    if not os.path.exists(target):
+        os.makedirs(target)
+
+def listItems():
+    return os.listdir(source)
+
+def outputName(item):
+    return os.path.splitext(item)[0] + '.obj'
+
+def itemInputs(item):
+    return [os.path.join(source, item)]
 
-# Download the watertight reconstruction code from: https://github.com/autonomousvision/occupancy_networks/tree/master/external/mesh-fusion
-# Execute the following commands in the terminal to get the watertight meshes.
+def itemOutputs(item):
+    return [os.path.join(target, outputName(item))]
 
-# scale
-step1 = 'python 1_scale.py --in_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/1_sort/1_{}_off --out_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/1_{}_obj_scaled/'.format(dataName, dataName)
-step2 = 'python 2_fusion.py --mode=render --in_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/1_{}_obj_scaled/ --depth_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/2_{}_obj_depth/ --out_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/2_{}_obj_watertight/'.format(dataName, dataName, dataName)
-step3 = 'python 2_fusion.py --mode=fuse --in_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/1_{}_obj_scaled/ --depth_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/2_{}_obj_depth/ --out_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/2_{}_obj_watertight/'.format(dataName, dataName, dataName)
-step4 = 'python 3_simplify.py --in_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/2_{}_obj_watertight/ --out_dir=/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/3_{}_obj_out/'.format(dataName, dataName)
+def processItem(item):
+    vertices, faces = readMesh(os.path.join(source, item))
+    vertices, faces = reconstruct(vertices, faces, resolution, views, truncation, padding)
+    mesh = trimesh.Trimesh(vertices, faces)
+    if keepLargest:
+        mesh = max(mesh.split(only_watertight=False), key=lambda part: len(part.faces))
+    mesh.export(os.path.join(target, outputName(item)))
+    print(item, mesh.is_watertight, len(mesh.faces))
 
-print(step1)
-print(step2)
-print(step3)
-print(step4)
\ No newline at end of file
+if __name__ == '__main__':
+    prepare()
+    for item in listItems():
+        processItem(item)
@@ -1,12 +1,24 @@
 import os
-import trimesh
+from pipeline.audit import auditMesh, writeReport
 
 # Remove the meshes that are not watertight after reconstruction.
+# The audit of every mesh, removed or not, is kept in a columnar report next to the folder.
 source = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/2_reconstruct/4_ycb_good'
+reportPath = source.rstrip('/') + '_audit.npz'
 
-for f in os.listdir(source):
+def listItems():
+    return os.listdir(source)
+
+def processItem(f):
     print(f)
-    mesh = trimesh.load_mesh(os.path.join(source,f))
-    if not mesh.is_watertight:
+    row = auditMesh(os.path.join(source,f))
+    if not row[1]:
         os.remove(os.path.join(source, f))
+    return row
+
+def finish(items, results):
+    writeReport(reportPath, results)
 
+if __name__ == '__main__':
+    items = listItems()
+    finish(items, [processItem(f) for f in items])
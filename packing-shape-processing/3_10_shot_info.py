@@ -0,0 +1,60 @@
+import os
+import trimesh
+import numpy as np
+from pipeline.heightmaps import shotRotations, writeAtlas
+
+# Precompute the shotInfo of Space: top / bottom heightmaps and masks of every posed shape in every Z rotation.
+# The shapes are the ones in shapeDict: the posed files of 3_6_vhacd_with_poses.py at the meshScale of the env.
+# Every shape gets its own npz, finish() packs all of them into one atlas that Space memory maps
+# (pass the atlas folder as args['shotInfo']).
+
+root = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/3_packing'
+
+datatype = 'ycb' # apc ycb rss
+
+source_path = os.path.join(root, '10_{}_vhacd_with_pose'.format(datatype))
+target_path = os.path.join(root, '12_{}_shot_info'.format(datatype))
+atlas_path  = os.path.join(root, '12_{}_shot_atlas'.format(datatype))
+
+resolutionH = 0.01 # same as the resolutionH of Space
+ZRotNum = 8
+meshScale = 1 # same as args['meshScale'] of PackingGame, the scale of the shapes in shapeDict
+rayShift = 0.001 # shift of gen_ray_origin_direction
+stageParams = {'resolutionH': resolutionH, 'ZRotNum': ZRotNum, 'meshScale': meshScale, 'rayShift': rayShift}
+
+def prepare():
+    if not os.path.exists(target_path):
+        os.makedirs(target_path)
+
+def listItems():
+    return os.listdir(source_path)
+
+def itemInputs(ObjPath):
+    return [os.path.join(source_path, ObjPath)]
+
+def itemOutputs(ObjPath):
+    return [os.path.join(target_path, ObjPath[0:-4] + '.npz')]
+
+def processItem(ObjPath):
+    print(ObjPath)
+    mesh = trimesh.load(os.path.join(source_path, ObjPath), force='mesh')
+    mesh.apply_scale(meshScale)
+    shots = shotRotations(mesh, ZRotNum, resolutionH, rayShift)
+    np.savez(os.path.join(target_path, ObjPath[0:-4] + '.npz'), **{str(rotIdx): shot for rotIdx, shot in enumerate(shots)})
+
+def atlasEntries(items):
+    # Shapes are called like their files, <name>_<poseIdx>.
+    for ObjPath in sorted(items):
+        npzPath = os.path.join(target_path, ObjPath[0:-4] + '.npz')
+        if not os.path.exists(npzPath):
+            continue
+        shots = np.load(npzPath)
+        yield ObjPath[0:-4], [shots[str(rotIdx)] for rotIdx in range(ZRotNum)]
+
+def finish(items, results):
+    writeAtlas(atlas_path, atlasEntries(items), ZRotNum)
+
+if __name__ == '__main__':
+    prepare()
+    items = listItems()
+    finish(items, [processItem(ObjPath) for ObjPath in items])
@@ -0,0 +1,46 @@
+import os
+import trimesh
+import numpy as np
+from pipeline.properties import shapeProperties, writeTable
+
+# Volume, per rotation extents, hull volume, center of mass and inertia of every posed shape, computed once.
+# The shapes are the files Interface loads (10_*_vhacd_with_pose). Every shape gets its own row file,
+# finish() stacks them into one structured array, read by Interface(properties=...) and PackingGame (args['properties']).
+
+datatype = 'ycb' # apc ycb rss
+rootPath = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/3_packing'
+
+shapeF = os.path.join(rootPath, '10_{}_vhacd_with_pose'.format(datatype))
+rowF = os.path.join(rootPath, '13_{}_properties'.format(datatype))
+tablePath = os.path.join(rootPath, '13_{}_properties.npy'.format(datatype))
+
+ZRotNum = 8
+stageParams = {'ZRotNum': ZRotNum}
+
+def prepare():
+    if not os.path.exists(rowF):
+        os.makedirs(rowF)
+
+def listItems():
+    return sorted(os.listdir(shapeF))
+
+def itemInputs(f):
+    return [os.path.join(shapeF, f)]
+
+def itemOutputs(f):
+    return [os.path.join(rowF, f[0:-4] + '.npy')]
+
+def processItem(f):
+    mesh = trimesh.load(os.path.join(shapeF, f), force='mesh')
+    row = shapeProperties(f[0:-4], mesh, ZRotNum)
+    np.save(os.path.join(rowF, f[0:-4] + '.npy'), row)
+    print(f, row['volume'][0])
+
+def finish(items, results):
+    rows = [np.load(os.path.join(rowF, f[0:-4] + '.npy')) for f in items if os.path.exists(os.path.join(rowF, f[0:-4] + '.npy'))]
+    writeTable(tablePath, rows)
+
+if __name__ == '__main__':
+    prepare()
+    items = listItems()
+    finish(items, [processItem(f) for f in items])
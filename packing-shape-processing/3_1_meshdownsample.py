@@ -4,7 +4,6 @@ import pymeshlab
 
 # Downsample the meshes to specified triangle number since the original reconstructed meshes have too many triangles.
 
-ms = pymeshlab.MeshSet()
 root = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/3_packing/'
 datatype = 'ycb' # apc ycb rss
 source_path = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/1_sort/0_abc_obj'
@@ -12,26 +11,53 @@ target_path ='1_{}_downsample'.format(datatype)
 target_path = os.path.join(root, target_path)
 
 base_path = os.path.join(root,source_path)
-paths = os.listdir(base_path)
 
-triangleNum = [2500]
+triangleNum = [500, 2500, 10000] # level of detail ladder
+stageParams = {'triangleNum': triangleNum}
 
-for resolution in triangleNum:
-    if not os.path.exists(os.path.join(target_path, str(resolution))):
-        os.makedirs(os.path.join(target_path, str(resolution)))
+ms = None
 
-for p in paths:
+def prepare():
+    for resolution in triangleNum:
+        if not os.path.exists(os.path.join(target_path, str(resolution))):
+            os.makedirs(os.path.join(target_path, str(resolution)))
+
+def initWorker():
+    # One MeshSet per process, pymeshlab objects can not be shared across workers.
+    global ms
+    ms = pymeshlab.MeshSet()
+
+def listItems():
+    return os.listdir(base_path)
+
+def itemInputs(p):
+    return [os.path.join(base_path, p)]
+
+def itemOutputs(p):
+    return [os.path.join(target_path, str(resolution), p) for resolution in triangleNum]
+
+def diagnostics(mesh):
+    # Checked on the arrays already in memory instead of reloading the files with trimesh.
+    triMesh = trimesh.Trimesh(vertices=mesh.vertex_matrix(), faces=mesh.face_matrix())
+    return triMesh.is_convex, triMesh.is_watertight, len(triMesh.faces)
+
+def processItem(p):
     PlyPath = os.path.join(base_path, p)
+    ms.clear()
+    ms.load_new_mesh(PlyPath)
+    print('originMesh: is_convex {}, is_watertight {}, triangles number {}'.format(*diagnostics(ms.current_mesh())))
 
-    for resolution in triangleNum:
+    # Finest level first, every coarser level is decimated from the previous one.
+    for resolution in sorted(triangleNum, reverse=True):
 
         savepath = os.path.join(target_path, str(resolution),  p)
-        ms.load_new_mesh(PlyPath)
         ms.simplification_quadric_edge_collapse_decimation(targetfacenum = resolution, preservenormal = True, preserveboundary = True, preservetopology = True)
         ms.save_current_mesh(savepath)
 
-        originMesh = trimesh.load(PlyPath)
-        print('originMesh: is_convex {}, is_watertight {}, triangles number {}'.format(originMesh.is_convex, originMesh.is_watertight, len(originMesh.triangles)))
+        print('downMesh {}: is_convex {}, is_watertight {}, triangles number {}'.format(resolution, *diagnostics(ms.current_mesh())))
 
-        downMesh = trimesh.load(savepath)
-        print('downMesh: is_convex {}, is_watertight {}, triangles number {}'.format(downMesh.is_convex, downMesh.is_watertight, len(downMesh.triangles)))
+if __name__ == '__main__':
+    prepare()
+    initWorker()
+    for p in listItems():
+        processItem(p)
@@ -8,6 +8,10 @@ import pyquaternion
 import sys
 sys.path.append('../../')
 from environment.physics0.Interface import Interface
+from pipeline.geometry import canonicalYaw, transformPoints
+from pipeline.poseVerify import settleBatch
+from pipeline.occupancy import voxelize, occupiedCount, pairwiseXorCount
+from pipeline.stablePoses import stablePoses
 
 # Generate the stable poses for the objects.
 
@@ -18,7 +22,8 @@ def extendMat(mat3, translation = None):
         mat4[0:3,3] = translation
     return mat4
 
-interVal = 20
+interVal = 64
+verifyMode = 'batched' # 'batched' settles all candidate poses in one world, 'serial' one after another
 root = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/3_packing'
 
 datatype = 'ycb' # apc ycb rss
@@ -30,32 +35,51 @@ vhacd_path = os.path.join(root, '5_{}_vhacd'.format(datatype))
 target_path = os.path.join(root, expName)
 
 logDir = os.path.join(root, 'debug', expName)
-
-if not os.path.exists(target_path): os.makedirs(target_path)
-if not os.path.exists(logDir) : os.makedirs(logDir)
-dirs = os.listdir(base_path)
+stablePoseCache = os.path.join(root, 'stable_pose_cache')
 
 bin_dimension = [0.8, 0.8, 0.30]
-objPath = os.path.join(root, vhacd_path)
-interface = Interface(bin=bin_dimension, foldername=objPath,
-                      visual=False, scale=[1, 1, 1])
+stageParams = {'interVal': interVal, 'bin_dimension': bin_dimension, 'verifyMode': verifyMode}
+interface = None
+
+def prepare():
+    if not os.path.exists(target_path): os.makedirs(target_path)
+    if not os.path.exists(logDir) : os.makedirs(logDir)
+
+def initWorker():
+    # Every worker owns its own PyBullet DIRECT connection.
+    global interface
+    interface = Interface(bin=bin_dimension, foldername=vhacd_path,
+                          visual=False, scale=[1, 1, 1])
+
+def listItems():
+    return os.listdir(base_path)
 
-for PlyPath in dirs:
+def itemInputs(PlyPath):
+    # The simulator check spawns the decomposed shape, so it is an input as well.
+    return [os.path.join(base_path, PlyPath), os.path.join(vhacd_path, PlyPath[0:-4] + '.obj')]
+
+def itemOutputs(PlyPath):
+    return [os.path.join(target_path, PlyPath[0:-4] + '.pt')]
+
+def processItem(PlyPath):
     name = PlyPath[0:-4]
     print(name)
     record = os.path.join(target_path, name  + '.pt')
     if os.path.exists(record):
-        continue
+        return
     objPath = os.path.join(base_path,PlyPath)
 
     mesh = trimesh.load(objPath)
     extentX, extentY = mesh.extents[0:2] * 2
 
-    transforms, probs = mesh.compute_stable_poses()  # Computes stable orientations of a mesh and their quasi-static probabilities.
+    # Stable orientations and their quasi-static probabilities, the hull is built once and reused below.
+    hull = mesh.convex_hull
+    transforms, probs = stablePoses(mesh, hull=hull, cacheDir=stablePoseCache)
     transforms = transforms[0:10]
     probs = probs[0:10]
 
-    mesh.apply_translation(-mesh.bounds[0])
+    shift = -mesh.bounds[0]
+    mesh.apply_translation(shift)
     meshList = []
     meshExtents = []
 
@@ -63,63 +87,58 @@ for PlyPath in dirs:
 
 
     validT = []
-    for T in transforms:
-        quat = transforms3d.quaternions.mat2quat(T[0:3, 0:3])
-        quat = [quat[1], quat[2], quat[3], quat[0]]  # Saved in xyzw
+    if verifyMode == 'batched':
+        drifts = settleBatch(interface, [(name, T) for T in transforms], linearTol=0.01, angularTol=0.01, maxBatch=10)
+        for T, (r_diff, t_diff) in zip(transforms, drifts):
+            if r_diff > 0.1 or t_diff > 0.05:
+                continue
+            validT.append(T)
+    else:
+        for T in transforms:
+            quat = transforms3d.quaternions.mat2quat(T[0:3, 0:3])
+            quat = [quat[1], quat[2], quat[3], quat[0]]  # Saved in xyzw
 
-        id = interface.addObject(name,
-                                 targetFLB=[0.4, 0.4, 0],
-                                 rotation=quat,
-                                 linearDamping=0.5,
-                                 angularDamping=0.5)
+            id = interface.addObject(name,
+                                     targetFLB=[0.4, 0.4, 0],
+                                     rotation=quat,
+                                     linearDamping=0.5,
+                                     angularDamping=0.5)
 
-        _, vertices = p.getMeshData(id)
-        vertices = np.array(vertices)
+            _, vertices = p.getMeshData(id)
+            vertices = np.array(vertices)
 
-        aabbBefore = interface.get_wraped_AABB(id)
-        _, orienBefore, positionBefore = interface.get_Wraped_Position_And_Orientation(id, getPosBase=True)
+            aabbBefore = interface.get_wraped_AABB(id)
+            _, orienBefore, positionBefore = interface.get_Wraped_Position_And_Orientation(id, getPosBase=True)
 
-        succeeded, valid = interface.simulateToQuasistatic(linearTol=0.01, angularTol=0.01, maxBatch=10)
-        aabbAfter = p.getAABB(id)
-        _, orienAfter, positionAfter = interface.get_Wraped_Position_And_Orientation(id, getPosBase=True)
+            succeeded, valid = interface.simulateToQuasistatic(linearTol=0.01, angularTol=0.01, maxBatch=10)
+            aabbAfter = p.getAABB(id)
+            _, orienAfter, positionAfter = interface.get_Wraped_Position_And_Orientation(id, getPosBase=True)
 
-        interface.removeBody(id)
+            interface.removeBody(id)
 
-        q1 = pyquaternion.Quaternion([orienBefore[3], *orienBefore[0:3]])  # wxyz
-        q2 = pyquaternion.Quaternion([orienAfter[3], *orienAfter[0:3]])
-        r_diff = pyquaternion.Quaternion.absolute_distance(q1, q2)
+            q1 = pyquaternion.Quaternion([orienBefore[3], *orienBefore[0:3]])  # wxyz
+            q2 = pyquaternion.Quaternion([orienAfter[3], *orienAfter[0:3]])
+            r_diff = pyquaternion.Quaternion.absolute_distance(q1, q2)
 
-        t_diff = np.linalg.norm(np.array(positionBefore) - np.array(positionAfter))
+            t_diff = np.linalg.norm(np.array(positionBefore) - np.array(positionAfter))
 
-        if r_diff > 0.1 or t_diff > 0.05:
-            continue
-        validT.append(T)
+            if r_diff > 0.1 or t_diff > 0.05:
+                continue
+            validT.append(T)
 
     transforms = validT
     # Secondly, Check if this shape is repeat in the list
+    # Rotating the mesh only moves its hull and its center of mass offset, so sweep those arrays.
+    hullVertices = hull.vertices + shift
+    comOffset = mesh.center_mass - mesh.centroid
     for i in range(len(transforms)):
         T = transforms[i]
 
-        mesh2tran = mesh.copy()
-        mesh2tran.apply_transform(T)
-        mesh2tran.apply_translation(-mesh2tran.bounds[0])
-
         # place the shape with given prefer
-        angles = 360
-        areaList = []
-        rotMeshList = []
-        for angleIdx in range(angles):
-            rotMesh =  mesh2tran.copy()
-            Tz = extendMat(transforms3d.euler.euler2mat(0, 0, angleIdx * np.pi * 2 / angles, 'sxyz'))
-            rotMesh.apply_transform(Tz)
-
-            if rotMesh.extents[0] <= rotMesh.extents[1]: # x 方向要少
-                if rotMesh.center_mass[1] <= rotMesh.centroid[1]:
-                    areaList.append(rotMesh.extents[0] * rotMesh.extents[1])
-                    rotMeshList.append(rotMesh.copy())
-
-        bestAngle = int(np.argmin(areaList))
-        mesh2tran = rotMeshList[bestAngle]
+        bestAngle, Tz = canonicalYaw(transformPoints(hullVertices, T), np.dot(T[0:3, 0:3], comOffset), 360)
+
+        mesh2tran = mesh.copy()
+        mesh2tran.apply_transform(np.dot(Tz, T))
         mesh2tran.apply_translation(-mesh2tran.bounds[0])
         meshList.append(mesh2tran)
         meshExtents.append(mesh2tran.extents)
@@ -131,26 +150,16 @@ for PlyPath in dirs:
         validList = []
         meshExtents = np.max(np.array(meshExtents),axis=0)
 
-        xRange = np.linspace(0, meshExtents[0], interVal)
-        yRange = np.linspace(0, meshExtents[1], interVal)
-        zRange = np.linspace(0, meshExtents[2], interVal)
-
-        x = xRange.repeat(interVal * interVal, axis=0).reshape(-1, 1)
-        y = yRange.repeat(interVal, axis=0).reshape((1, -1)).repeat(interVal, axis=0).reshape(-1, 1)
-        z = zRange.reshape((1, -1)).repeat(interVal * interVal, axis=0).reshape(-1, 1)
-        points = np.concatenate([x, y, z], axis=1)
-
-        checkLabels = [m.contains(points) for m in meshList]
+        # Voxelize every posed mesh once, then compare the packed bitsets.
+        checkLabels = [voxelize(m, meshExtents, interVal) for m in meshList]
+        occupied = occupiedCount(np.stack(checkLabels))
+        xorDistances = pairwiseXorCount(checkLabels)
 
         for i in range(lenPos):
             if i in invalidList: continue
             for j in range(i + 1, lenPos):
                 if j in invalidList: continue
-                verticesI = checkLabels[i]
-                verticesJ = checkLabels[j]
-
-                xorDistance = np.sum(np.logical_xor(verticesI, verticesJ))
-                percentage = xorDistance / np.sum(verticesI)
+                percentage = xorDistances[i, j] / occupied[i]
 
                 percentage /= 2
                 print('dist {} and {}: {}'.format(i, j, percentage))
@@ -167,3 +176,8 @@ for PlyPath in dirs:
 
         torch.save(validTransforms, target_path + '/{}.pt'.format(name))
 
+if __name__ == '__main__':
+    prepare()
+    initWorker()
+    for PlyPath in listItems():
+        processItem(PlyPath)
@@ -3,6 +3,7 @@ import trimesh
 import os
 import numpy as np
 import transforms3d
+from pipeline.geometry import minAreaYaw, transformPoints
 
 # Rotate the mesh to the poses with the minimum area.
 
@@ -22,52 +23,46 @@ source_path = os.path.join(root, '0_{}_scale'.format(datatype))
 pose_path   = os.path.join(root, '3_{}_stable_poses'.format(datatype))
 target_path = os.path.join(root, '4_{}_min_area'.format(datatype))
 
-if not os.path.exists(target_path):
-    os.makedirs(target_path)
+grain = 360 * 4
+stageParams = {'grain': grain}
 
-dirs = os.listdir(source_path)
+def prepare():
+    if not os.path.exists(target_path):
+        os.makedirs(target_path)
 
 board = trimesh.primitives.Box(extents = [1,1,0.001])
 board.apply_translation([0,0,-0.0005])
 
-for PlyPath in dirs:
+def listItems():
+    return os.listdir(source_path)
+
+def itemInputs(PlyPath):
+    return [os.path.join(source_path, PlyPath), os.path.join(pose_path, PlyPath[0:-4] + '.pt')]
+
+def itemOutputs(PlyPath):
+    return [os.path.join(target_path, PlyPath[0:-4] + '.pt')]
+
+def processItem(PlyPath):
     print(PlyPath)
     objPath = os.path.join(source_path,PlyPath)
     posePath = os.path.join(pose_path, PlyPath[0:-4] + '.pt')
     if not os.path.exists(posePath):
-        continue
+        return
     originMesh = trimesh.load(objPath)
+    hullVertices = originMesh.convex_hull.vertices
 
     transforms = torch.load(posePath)
     minTransforms = []
     for tranIdx in range(len(transforms)):
-        stableMesh = originMesh.copy()
-        stableMesh.apply_transform(transforms[tranIdx])
-
-        grain = 360 * 4
-        areaList = np.ones((grain)) * 1e10
-
-        rotList = []
-        # meshList = []
-        for angleIdx in range(grain):
-            rotMesh = stableMesh.copy()
-            Tz = extendMat(transforms3d.euler.euler2mat(0, 0, angleIdx * np.pi * 2 / grain, 'sxyz'))
-            rotMesh.apply_transform(Tz)
-            areaList[angleIdx] = rotMesh.extents[0] * rotMesh.extents[1]
-            rotList.append(Tz)
-            # rotMesh.apply_translation([0,0,0.05 * angleIdx])
-            # meshList.append(rotMesh)
-        bestAngle = int(np.argmin(areaList))
-        bestRot = rotList[bestAngle]
-
-        rotMesh = stableMesh.copy()
-        rotMesh.apply_transform(bestRot)
-        rotMesh.apply_translation(-rotMesh.bounds[0])
-
+        stableVertices = transformPoints(hullVertices, transforms[tranIdx])
+        bestAngle, bestRot = minAreaYaw(stableVertices, grain)
 
         finalTransform = np.dot(bestRot, transforms[tranIdx])
         minTransforms.append(finalTransform)
 
     torch.save(minTransforms, os.path.join(target_path, PlyPath[0:-4] + '.pt'))
 
-
+if __name__ == '__main__':
+    prepare()
+    for PlyPath in listItems():
+        processItem(PlyPath)
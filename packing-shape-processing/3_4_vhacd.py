@@ -1,7 +1,7 @@
 import pybullet as p
 import os
 import trimesh
-p.connect(p.DIRECT)
+from pipeline.vhacd import decompose
 
 # Decompose the meshes into convex hulls.
 
@@ -14,11 +14,29 @@ rootPath = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/3_p
 
 sourceF = os.path.join(rootPath, sourceF)
 targetF = os.path.join(rootPath, targetF)
+cacheF  = os.path.join(rootPath, 'vhacd_cache') # decompositions by input content and parameters
 
-if not os.path.exists(os.path.join(targetF)):
-    os.makedirs(targetF)
+# Extra keyword arguments for p.vhacd, e.g. {'resolution': 100000, 'concavity': 0.0025}.
+vhacdParams = {}
+stageParams = {'vhacd': vhacdParams}
 
-for f in os.listdir(sourceF):
+def prepare():
+    if not os.path.exists(os.path.join(targetF)):
+        os.makedirs(targetF)
+
+def initWorker():
+    p.connect(p.DIRECT)
+
+def listItems():
+    return os.listdir(sourceF)
+
+def itemInputs(f):
+    return [os.path.join(sourceF, f)]
+
+def itemOutputs(f):
+    return [os.path.join(targetF, f.replace('.off', '.obj'))]
+
+def processItem(f):
     name_in = os.path.join(sourceF, f)
     triIn = trimesh.load(name_in)
 
@@ -29,4 +47,10 @@ for f in os.listdir(sourceF):
 
     name_log = os.path.join(targetF, "")
 
-    p.vhacd(name_out, name_out, '')
+    decompose(name_out, name_out, vhacdParams, cacheF)
+
+if __name__ == '__main__':
+    prepare()
+    initWorker()
+    for f in listItems():
+        processItem(f)
@@ -4,6 +4,8 @@ import os
 import numpy as np
 import transforms3d
 import time
+import glob
+import re
 
 def extendMat(mat3, translation = None):
     mat4 = np.eye(4)
@@ -21,20 +23,32 @@ source_path  = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process
 pose_path = os.path.join(root, '4_{}_min_area'.format(datatype))
 target_path = os.path.join(root, '9_{}_for_draw'.format(datatype))
 
-if not os.path.exists(target_path):
-    os.makedirs(target_path)
-
-dirs = os.listdir(source_path)
+def prepare():
+    if not os.path.exists(target_path):
+        os.makedirs(target_path)
 
 board = trimesh.primitives.Box(extents = [1,1,0.001])
 board.apply_translation([0,0,-0.0005])
 
-for PlyPath in dirs:
+def listItems():
+    return os.listdir(source_path)
+
+def itemInputs(PlyPath):
+    return [os.path.join(source_path, PlyPath), os.path.join(pose_path, PlyPath[0:-4] + '.pt')]
+
+def itemOutputs(PlyPath):
+    # One mesh per pose, the number of poses is only known once they are written.
+    # The glob also matches the poses of other meshes (foo_1_0.obj for foo), so the name is matched exactly.
+    pattern = re.compile(re.escape(PlyPath[0:-4]) + r'_\d+\.obj')
+    return [path for path in glob.glob(os.path.join(glob.escape(target_path), glob.escape(PlyPath[0:-4]) + '_[0-9]*.obj'))
+            if pattern.fullmatch(os.path.basename(path))]
+
+def processItem(PlyPath):
     print(PlyPath)
     objPath = os.path.join(source_path,PlyPath)
     posePath = os.path.join(pose_path, PlyPath[0:-4] + '.pt')
     if not os.path.exists(posePath):
-        continue
+        return
     originMesh = trimesh.load(objPath)
 
     transforms = torch.load(posePath)
@@ -46,3 +60,7 @@ for PlyPath in dirs:
         filename = os.path.join(target_path, PlyPath[0:-4] +  '_{}.obj'.format(tranIdx))
         stableMesh.export(filename)
 
+if __name__ == '__main__':
+    prepare()
+    for PlyPath in listItems():
+        processItem(PlyPath)
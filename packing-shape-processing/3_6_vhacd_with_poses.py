@@ -1,7 +1,10 @@
 import pybullet as p
 import os
+import torch
 import trimesh
-p.connect(p.DIRECT)
+import numpy as np
+from pipeline.geometry import extendMat
+from pipeline.vhacd import decompose, objCenter, objScale, transformObj
 
 datatype = 'ycb' # apc ycb rss
 sourceF  = '9_{}_mass_mesh_with_pose'.format(datatype)
@@ -10,27 +13,82 @@ rootPath = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/3_p
 
 sourceF = os.path.join(rootPath, sourceF)
 targetF = os.path.join(rootPath, targetF)
+unposedF = os.path.join(rootPath, '5_{}_vhacd'.format(datatype))    # output of 3_4_vhacd.py
+poseF    = os.path.join(rootPath, '4_{}_min_area'.format(datatype)) # output of 3_3_min_area.py
+cacheF   = os.path.join(rootPath, 'vhacd_cache')
 
-if not os.path.exists(os.path.join(targetF)):
-    os.makedirs(targetF)
+# Extra keyword arguments for p.vhacd, e.g. {'resolution': 100000, 'concavity': 0.0025}.
+vhacdParams = {}
+# A posed mesh <name>_<i> is its centered mesh rotated by the i-th pose, so the unposed decomposition
+# from 3_4 is rotated instead of decomposing again.
+reuseUnposed = True
+# V-HACD voxelizes relative to the bounding box, so rescaling the first result matches a second run.
+secondPass = False
+stageParams = {'vhacd': vhacdParams, 'reuseUnposed': reuseUnposed, 'secondPass': secondPass}
 
-for f in os.listdir(sourceF):
+def prepare():
+    if not os.path.exists(os.path.join(targetF)):
+        os.makedirs(targetF)
+
+def initWorker():
+    p.connect(p.DIRECT)
+
+def listItems():
+    return os.listdir(sourceF)
+
+def unposedSource(f):
+    # None when the name has no _<poseIdx> suffix, such a mesh is decomposed on its own.
+    name, _, poseIdx = f[0:-4].rpartition('_')
+    if not name or not poseIdx.isdigit():
+        return None
+    return os.path.join(unposedF, name + '.obj'), os.path.join(poseF, name + '.pt'), int(poseIdx)
+
+def itemInputs(f):
+    inputs = [os.path.join(sourceF, f)]
+    source = unposedSource(f) if reuseUnposed else None
+    if source is not None:
+        inputs += list(source[0:2])
+    return inputs
+
+def itemOutputs(f):
+    return [os.path.join(targetF, f.replace('.off', '.obj'))]
+
+def processItem(f):
     name_in = os.path.join(sourceF, f)
     triIn = trimesh.load(name_in)
 
     f = f.replace('.off', '.obj')
     name_out = os.path.join(targetF, f)
-    triIn.export(name_out)
 
     name_log = os.path.join(targetF, "")
 
-    p.vhacd(name_out, name_out, '')
-    triOut = trimesh.load(name_out)
-    triIn.apply_scale(triIn.scale / triOut.scale )
-    triIn.export(name_out)
+    source = unposedSource(f) if reuseUnposed else None
+    if source is not None and os.path.exists(source[0]) and os.path.exists(source[1]):
+        # Only the rotation of the pose is applied here, scale and position are lined up with the posed mesh
+        # by its bounding box below.
+        unposedPath, posePath, poseIdx = source
+        transforms = torch.load(posePath)
+        transformObj(unposedPath, name_out, extendMat(transforms[poseIdx][0:3, 0:3]))
+    else:
+        triIn.export(name_out)
+        decompose(name_out, name_out, vhacdParams, cacheF)
+
+    scale = triIn.scale / objScale(name_out)
+    if secondPass:
+        triIn.apply_scale(scale)
+        triIn.export(name_out)
+        decompose(name_out, name_out, vhacdParams, cacheF)
+    else:
+        # Scale about the bounding box center, then move that center onto the one of the posed mesh: the rotated
+        # decomposition is centered at the center of mass of the unposed mesh, which need not be the posed one's.
+        center = objCenter(name_out)
+        transformObj(name_out, name_out, extendMat(np.eye(3) * scale, triIn.bounds.mean(axis=0) - center * scale))
 
-    p.vhacd(name_out, name_out, '')
     triIn = trimesh.load(name_in)
-    triOut = trimesh.load(name_out)
-    print('scale', triIn.scale / triOut.scale)
+    print('scale', triIn.scale / objScale(name_out))
 
+if __name__ == '__main__':
+    prepare()
+    initWorker()
+    for f in listItems():
+        processItem(f)
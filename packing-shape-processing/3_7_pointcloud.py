@@ -2,6 +2,8 @@ import time
 import numpy as np
 import os
 import trimesh
+from pipeline.pointStore import isFilled, layoutStore, loadIndex, writePoints
+from pipeline.sampling import SurfaceSampler, meshSeed
 
 datatype = 'ycb' # apc ycb rss
 
@@ -13,19 +15,61 @@ rootPath = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/3_p
 sourceF = os.path.join(rootPath, sourceF)
 targetF = os.path.join(rootPath, targetF)
 
-if not os.path.exists(os.path.join(targetF)):
-    os.makedirs(targetF)
+pointcloud_size = 100000
+pointcloudLevels = [1000, 10000, pointcloud_size] # nested prefixes of the same sample
+samplingSeed = 0
+outputMode = 'npz' # 'npz' writes one file per mesh, 'store' fills one memory mapped array, see pipeline/pointStore.py
+storeDtype = 'float32' # or 'float16' for the store
+storeF = os.path.join(rootPath, '8_{}_pointCloud_store'.format(datatype))
+stageParams = {'pointcloud_size': pointcloud_size, 'pointcloudLevels': pointcloudLevels, 'samplingSeed': samplingSeed, 'outputMode': outputMode, 'storeDtype': storeDtype}
 
+storeIndex = None
 
-pointcloud_size = 100000
-for f in os.listdir(sourceF):
+def prepare():
+    if not os.path.exists(os.path.join(targetF)):
+        os.makedirs(targetF)
+    if outputMode == 'store':
+        layoutStore(storeF, [f[0:-4] for f in listItems()], pointcloud_size, storeDtype)
+
+def initWorker():
+    global storeIndex
+    if outputMode == 'store':
+        storeIndex = loadIndex(storeF)
+
+def listItems():
+    return os.listdir(sourceF)
+
+def itemInputs(f):
+    return [os.path.join(sourceF, f)]
+
+def itemOutputs(f):
+    if outputMode == 'store':
+        return [] # the slot lives in the shared store, which must never be removed for one mesh, see itemValid
+    return [os.path.join(targetF, f[0:-4] + '.npz')]
+
+def itemValid(f):
+    if outputMode == 'store':
+        return isFilled(storeF, f[0:-4], pointcloud_size)
+    return True
+
+def processItem(f):
 
     name_in = os.path.join(sourceF, f)
     mesh = trimesh.load(name_in)  #
     mesh.apply_translation(-mesh.center_mass)
     s = time.time()
-    points, face_idx = mesh.sample(pointcloud_size, return_index=True)
+    sampler = SurfaceSampler(mesh.vertices, mesh.faces)
+    points, face_idx = sampler.sample(pointcloud_size, meshSeed(f[0:-4], samplingSeed))
     e = time.time()
     print(e-s)
-    filename = os.path.join(targetF, f[0:-4])
-    np.savez(filename, points=points)
+    if outputMode == 'store':
+        writePoints(storeF, storeIndex, f[0:-4], points)
+    else:
+        filename = os.path.join(targetF, f[0:-4])
+        np.savez(filename, points=points, levels=np.array(pointcloudLevels))
+
+if __name__ == '__main__':
+    prepare()
+    initWorker()
+    for f in listItems():
+        processItem(f)
@@ -0,0 +1,53 @@
+import os
+import torch
+import trimesh
+import numpy as np
+from pipeline.catalog import CatalogWriter
+from pipeline.pointStore import openStore, getPoints
+from pipeline.vhacd import objParts
+
+# Pack every processed shape into one binary catalog (see pipeline/catalog.py), with the convex parts of
+# its V-HACD decomposition, which Interface and the renderers can memory map instead of parsing OBJ files.
+
+datatype = 'ycb' # apc ycb rss
+rootPath = '/media/hang/f9f4716a-9f6f-4c7a-b604-6f088954bdef/dataset/process/3_packing'
+
+shapeF = os.path.join(rootPath, '10_{}_vhacd_with_pose'.format(datatype))
+poseF  = os.path.join(rootPath, '4_{}_min_area'.format(datatype))
+pointF = os.path.join(rootPath, '8_{}_pointCloud_with_pose'.format(datatype))
+storeF = os.path.join(rootPath, '8_{}_pointCloud_store'.format(datatype))
+catalogPath = os.path.join(rootPath, '11_{}_catalog.bin'.format(datatype))
+
+catalogPoints = 10000 # prefix of every point cloud kept in the catalog, 0 to leave them out
+
+def loadPoints(name, store):
+    if catalogPoints == 0:
+        return None
+    if store is not None and name in store[1]['slots']:
+        return getPoints(store, name, catalogPoints)
+    npzPath = os.path.join(pointF, name + '.npz')
+    if os.path.exists(npzPath):
+        return np.load(npzPath)['points'][0:catalogPoints]
+    return None
+
+def loadPose(name, poses):
+    # Posed shapes are called <name>_<poseIdx>.
+    base, poseIdx = name.rsplit('_', 1)
+    if base not in poses:
+        posePath = os.path.join(poseF, base + '.pt')
+        poses[base] = torch.load(posePath) if os.path.exists(posePath) else None
+    if poses[base] is None:
+        return np.eye(4)
+    return np.array(poses[base][int(poseIdx)])
+
+if __name__ == '__main__':
+    store = openStore(storeF) if os.path.exists(os.path.join(storeF, 'index.npz')) else None
+    poses = {}
+    writer = CatalogWriter(catalogPath)
+    for f in sorted(os.listdir(shapeF)):
+        print(f)
+        name = f[0:-4]
+        mesh = trimesh.load(os.path.join(shapeF, f), force='mesh')
+        writer.add(name, mesh.vertices, mesh.faces, mesh.convex_hull.vertices,
+                   loadPose(name, poses), loadPoints(name, store), objParts(os.path.join(shapeF, f)))
+    writer.close()
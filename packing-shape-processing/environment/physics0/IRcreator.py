@@ -78,7 +78,10 @@ class LoadItemCreator(ItemCreator):
         self.traj_index = 0
         self.item_index = 0
         print("Load dataset set: {}".format(data_name))
-        self.item_trajs = torch.load(self.data_name)
+        if self.data_name.endswith('.npy'):
+            self.item_trajs = np.load(self.data_name, mmap_mode='r') # int32 (sequences, length) from 3_8_dataset_generation.py
+        else:
+            self.item_trajs = torch.load(self.data_name)
         self.traj_nums = len(self.item_trajs)
 
     def reset(self, traj_index=None):
@@ -90,6 +93,8 @@ class LoadItemCreator(ItemCreator):
             self.traj_index = traj_index
 
         self.traj = self.item_trajs[self.traj_index]
+        if isinstance(self.traj, np.ndarray):
+            self.traj = self.traj.tolist()
         self.item_index = 0
         self.item_set = self.traj
         self.item_set.append(None)
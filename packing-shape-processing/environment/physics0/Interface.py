@@ -1,6 +1,7 @@
 import trimesh,os,math
 import pybullet as p
 import numpy as np
+from .shapeRegistry import shapeRegistry
 
 def extendMat(mat3, translation = None):
     mat4 = np.eye(4)
@@ -9,6 +10,21 @@ def extendMat(mat3, translation = None):
         mat4[0:3,3] = translation
     return mat4
 
+def quaternionMatrices(quats):
+    # (N, 4) xyzw quaternions, as PyBullet returns them, to (N, 3, 3) rotation matrices.
+    x, y, z, w = quats.T
+    mats = np.empty((len(quats), 3, 3))
+    mats[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    mats[:, 0, 1] = 2 * (x * y - z * w)
+    mats[:, 0, 2] = 2 * (x * z + y * w)
+    mats[:, 1, 0] = 2 * (x * y + z * w)
+    mats[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    mats[:, 1, 2] = 2 * (y * z - x * w)
+    mats[:, 2, 0] = 2 * (x * z - y * w)
+    mats[:, 2, 1] = 2 * (y * z + x * w)
+    mats[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return mats
+
 class Interface:
     
     def __init__(self, bin = [10, 10, 5],
@@ -17,12 +33,23 @@ class Interface:
                  scale = [1.0,1.0,1.0],
                  simulationScale = None,
                  maxBatch = 2,
+                 catalog = None,
+                 properties = None,
+                 checkEvery = None,
+                 stableWindow = 1,
+                 freezeAfter = None,
+                 wakeFactor = 10.0,
                  ):
         self.foldername = foldername
-        if not os.path.exists(self.foldername):
-            os.mkdir(foldername)
-
-        cid = p.connect(p.SHARED_MEMORY)
+        # Optional ShapeCatalog (packing-shape-processing/pipeline/catalog.py), trimesh objects and PyBullet shapes are
+        # then built from its arrays instead of the OBJ files.
+        self.catalog = catalog
+        # Optional PropertyTable (packing-shape-processing/pipeline/properties.py), masses come from its volumes.
+        self.properties = properties
+        os.makedirs(self.foldername, exist_ok=True)
+
+        # An earlier Interface closed with keepConnection=True leaves its connection and shapes to this one.
+        cid = 0 if p.isConnected() else p.connect(p.SHARED_MEMORY)
         self.visual = visual
 
         if (cid < 0):
@@ -51,8 +78,7 @@ class Interface:
             p.configureDebugVisualizer(p.COV_ENABLE_TINY_RENDERER, 0)
 
         self.containerFolder = self.foldername + '/../box_{}_{}_{}'.format(*self.bin)
-        if not os.path.exists(self.containerFolder):
-            os.mkdir(self.containerFolder)
+        os.makedirs(self.containerFolder, exist_ok=True)
         self.addBox(self.bin, [1,1,1], [0, 0, 0])
 
         if self.visual:
@@ -62,12 +88,49 @@ class Interface:
         self.AABBCompensation = np.array([0.002, 0.002, 0.002])
         self.cameraForRecord()
         self.meshDict = {}
+        self.massDict = {}
+        # Convex hull vertices per body, the AABB of a body only needs those.
+        self.hullDict = {}
+        # id -> (positionBase, orientation, bounds) of the last pose the bounds were computed for.
+        self.boundsCache = {}
+        # (ids, hull arrays, (N, 3, V) hull vertices) of the last getAllPositionAndOrientation, the only stack kept.
+        # PyBullet reuses the id of a removed body, so it only holds while the bodies still have those hull arrays.
+        self.stackedHulls = None
         self.maxBatch = maxBatch
-    def close(self):
-        p.disconnect()
+        # Settling: check velocities every checkEvery steps (None: once per batch) and stop once the bodies stayed
+        # below tolerance for stableWindow checks in a row. lastSteps holds the steps the last call took.
+        self.checkEvery = checkEvery
+        self.stableWindow = stableWindow
+        self.lastSteps = 0
+        # Freezing (freezeAfter not None): a dynamic body quiet for freezeAfter checks in a row gets mass 0 and leaves
+        # objsDynamic, so it is no longer integrated. Frozen bodies touched by the placed body, or by a body moving
+        # faster than wakeFactor times the tolerances (contact jitter stays below that), are woken again.
+        self.freezeAfter = freezeAfter
+        self.wakeFactor = wakeFactor
+        self.watched = set()
+        self.frozen = set()
+        self.quietChecks = {}
+        self.lastPoses = {}
+        # Ground plane of pipeline.poseVerify next to the container, None until it is added. reset() removes it.
+        self.groundId = None
+    def close(self, keepConnection = False):
+        if keepConnection:
+            # Only the bodies go, the next Interface reuses the connection and the shapes in shapeRegistry.
+            for i in reversed(range(p.getNumBodies())):
+                p.removeBody(p.getBodyUniqueId(i))
+        else:
+            shapeRegistry.forget()
+            p.disconnect()
 
     def removeBody(self, delId):
         p.removeBody(delId)
+        self.hullDict.pop(delId, None)
+        self.boundsCache.pop(delId, None)
+        self.stackedHulls = None
+        self.frozen.discard(delId)
+        self.watched.discard(delId)
+        self.quietChecks.pop(delId, None)
+        self.lastPoses.pop(delId, None)
         if delId in self.objsDynamic:
             self.objsDynamic.remove(delId)
 
@@ -85,16 +148,50 @@ class Interface:
         self.objs = []
         self.objsDynamic = []
         self.meshDict = {}
+        self.massDict = {}
+        self.hullDict = {}
+        self.boundsCache = {}
+        self.stackedHulls = None
+        self.watched = set()
+        self.frozen = set()
+        self.quietChecks = {}
+        self.lastPoses = {}
+        self.groundId = None
+
+    def stackedHullVertices(self, ids, keep = False):
+        # Short hulls are padded with their first vertex, which leaves their bounds unchanged.
+        # Only keep=True stacks are cached, other id lists (settling checks) are stacked on demand.
+        hulls = [self.hullDict[id] for id in ids]
+        cached = self.stackedHulls
+        if cached is not None and cached[0] == ids and all(a is b for a, b in zip(cached[1], hulls)):
+            return cached[2]
+        vertices = np.empty((len(ids), 3, max(len(hull) for hull in hulls)))
+        for index, hull in enumerate(hulls):
+            vertices[index, :, 0:len(hull)] = hull.T
+            vertices[index, :, len(hull):] = hull[0][:, None]
+        if keep:
+            self.stackedHulls = (ids, hulls, vertices)
+        return vertices
+
+    def getAllBounds(self, ids, keep = False):
+        # AABBs (N, 2, 3) and orientations (N, 4) of the bodies ids, in one pass over their stacked hulls.
+        ids = tuple(ids)
+        bases = np.empty((len(ids), 3))
+        orientations = np.empty((len(ids), 4))
+        if len(ids) == 0:
+            return np.empty((0, 2, 3)), orientations
+        for index, id in enumerate(ids):
+            bases[index], orientations[index] = p.getBasePositionAndOrientation(id)
+        rotated = np.matmul(quaternionMatrices(orientations), self.stackedHullVertices(ids, keep))
+        bounds = np.stack([rotated.min(axis=2), rotated.max(axis=2)], axis=1) + bases[:, None]
+        return bounds, orientations
 
     def getAllPositionAndOrientation(self, inner = True):
-        positions = []
-        orientations = []
-
-        for id in self.objs:
-            position, orientation = self.get_Wraped_Position_And_Orientation(id, inner)
-            positions.append(position)
-            orientations.append(orientation)
-
+        # FLB corners (N, 3) and orientations (N, 4) of all bodies in self.objs.
+        bounds, orientations = self.getAllBounds(self.objs, keep=True)
+        positions = bounds[:, 0]
+        if not inner:
+            positions /= self.defaultScale
         return positions, orientations
 
     def makeBox(self, bin, color, thick = 1):
@@ -140,22 +237,22 @@ class Interface:
 
             boxPath = os.path.join(self.containerFolder, 'Box' + str(index) + '.obj')
             if not os.path.exists(boxPath):
-                side.export(boxPath)
+                # Several pipeline workers may build the same container at once.
+                tmpPath = boxPath + '.{}.tmp.obj'.format(os.getpid())
+                side.export(tmpPath)
+                os.replace(tmpPath, boxPath)
 
             if self.visual:
-                visual_shape_id = p.createVisualShape(shapeType=p.GEOM_MESH,
-                                                      fileName=boxPath,
-                                                      rgbaColor = [0.6, 0.3, 0.1, 1],
-                                                      specularColor = [0.4, .4, 0],
-                                                      visualFramePosition=shift,
-                                                      # meshScale=scale
-                                                      )
-
-            collision_shape_id = p.createCollisionShape(shapeType=p.GEOM_MESH,
-                                                        fileName=boxPath,
-                                                        collisionFramePosition=shift,
-                                                        flags = 1,
-                                                        )
+                visual_shape_id = shapeRegistry.visualShape(boxPath, [1, 1, 1],
+                                                            rgbaColor = [0.6, 0.3, 0.1, 1],
+                                                            specularColor = [0.4, .4, 0],
+                                                            visualFramePosition=shift,
+                                                            )
+
+            collision_shape_id = shapeRegistry.collisionShape(boxPath, [1, 1, 1],
+                                                              collisionFramePosition=shift,
+                                                              flags = 1,
+                                                              )
 
             for _ in range(repeat):
                 if self.visual:
@@ -199,33 +296,26 @@ class Interface:
         if scale is None: scale = self.defaultScale
 
         targetFLB = np.array(targetFLB) * scale
+        objPath = path if path is not None else self.foldername+ "/" + name + ".obj"
+        meshScale = np.array(scale) * self.simulationScale
         if name in self.shapeMap:
-            mesh, visual_shape_id, collision_shape_id = self.shapeMap[name]
+            mesh, hull, visual_shape_id, collision_shape_id = self.shapeMap[name]
         else:
-
-            objPath = path if path is not None else self.foldername+ "/" + name + ".obj"
-            mesh = trimesh.load(objPath)
-            mesh.apply_scale(scale[0]*self.simulationScale)
+            # Meshes and shapes come from the process wide registry, parsed and created once per process.
+            catalog = self.catalog if path is None else None
+            mesh, hull = shapeRegistry.mesh(objPath, meshScale, catalog, name)
             # mass = mesh.volume * density
             if self.visual:
-                visual_shape_id = p.createVisualShape(shapeType=p.GEOM_MESH,
-                                                      fileName=objPath,
-                                                      meshScale=scale * self.simulationScale,
-                                                      )
+                visual_shape_id = shapeRegistry.visualShape(objPath, meshScale, catalog, name)
             else:
                 visual_shape_id = None
 
-            collision_shape_id = p.createCollisionShape(shapeType=p.GEOM_MESH,
-                                                  fileName=objPath,
-                                                  collisionFramePosition=[0.0, 0.0, 0.0],
-                                                  meshScale=scale * self.simulationScale)
-            self.shapeMap[name] = (mesh, visual_shape_id, collision_shape_id)
+            collision_shape_id = shapeRegistry.collisionShape(objPath, meshScale, catalog, name,
+                                                              collisionFramePosition=[0.0, 0.0, 0.0])
+            self.shapeMap[name] = (mesh, hull, visual_shape_id, collision_shape_id)
         if self.visual and color is not None:
-                objPath = path if path is not None else self.foldername + "/" + name + ".obj"
-                visual_shape_id = p.createVisualShape(shapeType=p.GEOM_MESH,
-                                                      fileName=objPath,
-                                                      meshScale=scale * self.simulationScale,
-                                                      rgbaColor=color)
+                visual_shape_id = shapeRegistry.visualShape(objPath, meshScale, self.catalog if path is None else None, name,
+                                                            rgbaColor=list(color))
 
         assert len(rotation) == 3 or len(rotation) == 4
         if len(rotation) == 3:
@@ -235,7 +325,10 @@ class Interface:
             rotation[2] *= math.sin(lenRot/2) * lenRot
             rotation += [math.cos(lenRot/2)]
 
-        mass = mesh.volume
+        if self.properties is not None and name in self.properties:
+            mass = self.properties.volume(name) * (scale[0] * self.simulationScale) ** 3
+        else:
+            mass = mesh.volume
         if self.visual:
             id = p.createMultiBody(baseMass=mass,
                                    basePosition=[-100, -100, -100],
@@ -250,6 +343,8 @@ class Interface:
                                    baseCollisionShapeIndex=collision_shape_id,
                                    useMaximalCoordinates=True)
         self.meshDict[id] = mesh
+        self.massDict[id] = mass
+        self.hullDict[id] = hull
         self.reset_Wraped_Position_And_Orientation(id, targetFLB)
 
         p.changeDynamics(id, -1,
@@ -268,47 +363,118 @@ class Interface:
             for i in range(int(batch/dt)):
                 p.stepSimulation()
 
-    def simulateToQuasistatic(self, givenId = None, linearTol = 0.001, angularTol = 0.001, batch = 1.0, dt = 0.01, maxBatch = 5):
-        end = False
+    def simulateToQuasistatic(self, givenId = None, linearTol = 0.001, angularTol = 0.001, batch = 1.0, dt = 0.01, maxBatch = 5,
+                              checkEvery = None, stableWindow = None):
+        if checkEvery is None: checkEvery = self.checkEvery
+        if stableWindow is None: stableWindow = self.stableWindow
         linearTolSqr = linearTol * linearTol
         angularTolSqr = angularTol * angularTol
-        batchCounter = 0
-
-        # while not end:
-        for _ in range(maxBatch):
-            if end: break
-            batchCounter += 1
-            # simulation a batch
-            for i in range(int(batch/dt)):
+        batchSteps = int(batch/dt)
+        totalSteps = batchSteps * maxBatch
+        checkEvery = batchSteps if checkEvery is None else checkEvery
+        steps = 0
+        stableChecks = 0
+        if self.freezeAfter is not None:
+            self.watched = set([givenId]) if givenId is not None else set(self.objsDynamic)
+
+        while steps < totalSteps:
+            chunk = min(checkEvery, totalSteps - steps)
+            for i in range(chunk):
                 p.stepSimulation()
-            # test
-            end = True
-
-            if givenId is not None:
-                id_List = [givenId]
+                if self.freezeAfter is not None:
+                    self.wakeTouched()
+            steps += chunk
+            self.lastSteps = steps
+
+            id_List = [givenId] if givenId is not None else list(self.objsDynamic)
+            if len(id_List) == 0:
+                break
+            velocities = np.array([p.getBaseVelocity(id) for id in id_List])
+            bounds, _ = self.getAllBounds(id_List)
+
+            midC = (bounds[:, 1] - bounds[:, 0]) / 2 + bounds[:, 0]
+            if np.any((midC[:, 0] <= 0) | (midC[:, 0] - self.bin[0] >= 0) |
+                      (midC[:, 1] <= 0) | (midC[:, 1] - self.bin[1] >= 0) |
+                      (midC[:, 2] <= 0)):
+                # print('midC out of bounds', midC)
+                return True, False
+
+            if self.freezeAfter is not None:
+                # Tolerances hold per nominal dt, as batch/dt does.
+                self.updateFrozen(linearTolSqr, angularTolSqr, chunk * dt, givenId)
+            if np.all(np.sum(velocities[:, 0] ** 2, axis=1) <= linearTolSqr) and \
+               np.all(np.sum(velocities[:, 1] ** 2, axis=1) <= angularTolSqr):
+                stableChecks += 1
+                if stableChecks >= stableWindow:
+                    break
             else:
-                id_List = self.objsDynamic
-
-            for id in id_List:
-                linear, angular = p.getBaseVelocity(id)
-
-                if linear[0] * linear[0] + linear[1] * linear[1] + linear[2] * linear[2] > linearTolSqr:
-                    end = False
-                if angular[0] * angular[0] + angular[1] * angular[1] + angular[2] * angular[2] > angularTolSqr:
-                    end = False
-
-                minC, maxC = self.get_wraped_AABB(id)
-
-                midC = (maxC - minC) / 2 + minC
-                if midC[0] <= 0 or midC[0] - self.bin[0] >= 0 or \
-                   midC[1] <= 0 or midC[1] - self.bin[1] >= 0 or \
-                   midC[2] <= 0:
-                    # print('midC out of bounds', midC)
-                    return True, False
-
+                stableChecks = 0
 
         return True, True
 
+    def freezeBody(self, id):
+        # Mass 0 alone keeps the body in the dynamic collision group, the static group (2, mask without 2) also
+        # skips its contacts with the container and other frozen bodies, which otherwise dominate a full bin's step.
+        p.changeDynamics(id, -1, mass=0.0)
+        p.resetBaseVelocity(id, [0, 0, 0], [0, 0, 0])
+        p.setCollisionFilterGroupMask(id, -1, 2, -3)
+        self.objsDynamic.remove(id)
+        self.frozen.add(id)
+        self.watched.discard(id)
+
+    def wakeBody(self, id):
+        p.changeDynamics(id, -1, mass=self.massDict[id])
+        p.setCollisionFilterGroupMask(id, -1, 1, -1)
+        self.frozen.discard(id)
+        self.quietChecks[id] = 0
+        self.lastPoses.pop(id, None)
+        self.objsDynamic.append(id)
+
+    def wakeBodies(self, ids):
+        # Wake the frozen ids and the frozen bodies resting on them (AABB overlap, bottom above the middle of the
+        # woken one), repeatedly: a frozen body on top would hold a woken one down like a fixed ceiling.
+        ids = [id for id in ids if id in self.frozen]
+        while len(ids) > 0:
+            for id in ids:
+                self.wakeBody(id)
+            if len(self.frozen) == 0:
+                break
+            frozen = np.array(sorted(self.frozen))
+            frozenBounds, _ = self.getAllBounds(frozen)
+            bounds, _ = self.getAllBounds(ids)
+            overlap = np.all((frozenBounds[:, None, 0] <= bounds[None, :, 1] + self.AABBCompensation) &
+                             (bounds[None, :, 0] <= frozenBounds[:, None, 1] + self.AABBCompensation), axis=2)
+            overlap &= frozenBounds[:, None, 0, 2] > (bounds[None, :, 0, 2] + bounds[None, :, 1, 2]) / 2
+            ids = [int(id) for id in frozen[np.any(overlap, axis=1)]]
+
+    def wakeTouched(self):
+        # After every step: frozen bodies touched by a watched (placed or fast) body are woken at once, a body
+        # pressed against a frozen one (a fixed wall) could otherwise be pushed through the floor.
+        touched = set()
+        for id in self.watched:
+            touched.update(contact[2] for contact in p.getContactPoints(bodyA=id) if contact[2] in self.frozen)
+        if touched:
+            self.wakeBodies(sorted(touched))
+
+    def updateFrozen(self, linearTolSqr, angularTolSqr, seconds, givenId = None):
+        # One check: count the quiet checks of the dynamic bodies and freeze the settled ones. Motion is measured
+        # since the last check, contact jitter in a pile averages out over it. Bodies that moved more than wakeFactor
+        # times the tolerances are watched for contacts until the next check.
+        self.watched = set([givenId]) if givenId in self.objsDynamic else set()
+        for id in list(self.objsDynamic):
+            position, orientation = p.getBasePositionAndOrientation(id)
+            last = self.lastPoses.get(id)
+            self.lastPoses[id] = (np.array(position), np.array(orientation))
+            if last is None:
+                continue
+            shift = np.sum((np.array(position) - last[0]) ** 2) / seconds ** 2
+            turn = (2 * math.acos(min(abs(np.dot(orientation, last[1])), 1.0))) ** 2 / seconds ** 2
+            self.quietChecks[id] = self.quietChecks.get(id, 0) + 1 if shift <= linearTolSqr and turn <= angularTolSqr else 0
+            if self.quietChecks[id] >= self.freezeAfter:
+                self.freezeBody(id)
+            elif shift > linearTolSqr * self.wakeFactor ** 2 or turn > angularTolSqr * self.wakeFactor ** 2:
+                self.watched.add(id)
+
     def simulateToQuasistaticRecord(self, givenId = None, linearTol = 0.001,
                               angularTol = 0.001, batch = 1.0, dt = 0.01, maxBatch = 5,
                                     id_List = [], returnRecord = True):
@@ -372,12 +538,26 @@ class Interface:
         if targetZ is not None:
             self.reset_Height(id, targetZ)
         p.changeDynamics(id, -1, mass = 0.0)
-        self.objsDynamic.remove(id)
+        if id in self.frozen:
+            # A disabled body collides like any other, only a frozen one sits in the static group.
+            self.frozen.discard(id)
+            p.setCollisionFilterGroupMask(id, -1, 1, -1)
+        else:
+            self.objsDynamic.remove(id)
+        self.watched.discard(id)
+        self.quietChecks.pop(id, None)
+        self.lastPoses.pop(id, None)
 
     def enableObjects(self):
+        for id in self.frozen:
+            p.setCollisionFilterGroupMask(id, -1, 1, -1)
+            self.quietChecks.pop(id, None)
+            self.lastPoses.pop(id, None)
+        self.frozen = set()
         for id in self.objs:
-            p.changeDynamics(id, -1, self.meshDict[id].volume)
-            self.objsDynamic.append(id)
+            p.changeDynamics(id, -1, self.massDict[id])
+            if id not in self.objsDynamic:
+                self.objsDynamic.append(id)
 
     def disableAllObject(self):
         for id in self.objsDynamic:
@@ -416,23 +596,29 @@ class Interface:
     def reset_Height(self, id, targetHeight):
         self.reset_trimesh_height(id, targetHeight)
 
-    def get_trimesh_AABB(self, id, inner = True):
+    def hullBounds(self, hull, positionBase, orientation):
+        # The extremes of a mesh along the axes are hull vertices, so the rotated hull gives the mesh AABB.
+        vertices = hull @ np.array(p.getMatrixFromQuaternion(orientation)).reshape((3, 3)).T
+        return np.array([vertices.min(axis=0), vertices.max(axis=0)]) + positionBase
+
+    def get_trimesh_bounds(self, id):
+        # Bounds of body id at its current pose, recomputed only after the body moved.
         positionBase, orientationT = p.getBasePositionAndOrientation(id)
-        mesh = self.meshDict[id].copy()
-        mat = p.getMatrixFromQuaternion(orientationT)
-        mesh.apply_transform(extendMat(np.array(mat).reshape((3,3)), positionBase))
-        bounds = mesh.bounds
+        cached = self.boundsCache.get(id)
+        if cached is not None and cached[0] == positionBase and cached[1] == orientationT:
+            return cached[2].copy(), positionBase, orientationT
+        bounds = self.hullBounds(self.hullDict[id], positionBase, orientationT)
+        self.boundsCache[id] = (positionBase, orientationT, bounds)
+        return bounds.copy(), positionBase, orientationT
+
+    def get_trimesh_AABB(self, id, inner = True):
+        bounds, _, _ = self.get_trimesh_bounds(id)
         if not inner:
             bounds = bounds / self.defaultScale
         return bounds
 
     def get_trimesh_Position_And_Orientation(self, id, inner = True, getPosBase = False):
-
-        positionBase, orientationT = p.getBasePositionAndOrientation(id)
-        mesh = self.meshDict[id].copy()
-        mat = p.getMatrixFromQuaternion(orientationT)
-        mesh.apply_transform(extendMat(np.array(mat).reshape((3,3)), positionBase))
-        bounds = mesh.bounds
+        bounds, positionBase, orientationT = self.get_trimesh_bounds(id)
 
         if not inner:
             bounds = bounds / self.defaultScale
@@ -458,8 +644,6 @@ class Interface:
         p.resetBasePositionAndOrientation(id, [*positionBase[0:2], positionHeight], orientationT)
 
     def reset_trimesh_Position_And_Orientation_new(self, id, targetFLB, targetOrientation = None):
-        mesh = self.meshDict[id].copy()
-        mat = p.getMatrixFromQuaternion(targetOrientation)
-        mesh.apply_transform(extendMat(np.array(mat).reshape((3,3))))
-        positionTarget = targetFLB - mesh.bounds[0]
+        bounds = self.hullBounds(self.hullDict[id], np.zeros(3), targetOrientation)
+        positionTarget = targetFLB - bounds[0]
         p.resetBasePositionAndOrientation(id, positionTarget, targetOrientation)
@@ -29,7 +29,7 @@ class PackingGame(gym.Env):
         self.scale         = args['scale']
         self.objPath       = args['objPath']
         self.meshScale     = args['meshScale']
-        self.shapeDict     = args['shapeDict']
+        self.shapeDict     = args.get('shapeDict') # None: built from args['catalog']
         self.infoDict      = args['infoDict']
         self.dicPath       = load(args['dicPath'])
         self.ZRotNum       = args['ZRotNum']
@@ -47,13 +47,24 @@ class PackingGame(gym.Env):
         self.visual        = args['visual']
         self.non_blocking  = args['non_blocking']
         self.time_limit    = args['time_limit']
+        self.catalog       = args.get('catalog') # optional pipeline.catalog.ShapeCatalog
+        self.properties    = args.get('properties') # optional pipeline.properties.PropertyTable or its .npy path
+        self.settleCheckEvery = args.get('settleCheckEvery') # steps between velocity checks, None: once per batch
+        self.settleWindow  = args.get('settleWindow', 1) # checks in a row below tolerance before settling stops
+        self.freezeAfter   = args.get('freezeAfter') # quiet checks before a packed item is frozen, None: never
+        if self.shapeDict is None:
+            from pipeline.catalog import catalogShapeDict
+            self.shapeDict = catalogShapeDict(self.catalog, self.dicPath, self.ZRotNum, self.meshScale)
+        if isinstance(self.properties, str):
+            from pipeline.properties import PropertyTable
+            self.properties = PropertyTable(self.properties, self.dicPath)
 
 
         self.interface = None
         self.item_vec = np.zeros((1000, 9))
         self.rangeX_A, self.rangeY_A = np.ceil(self.bin_dimension[0:2] / self.resolutionAct).astype(np.int32)
         self.space = Space(self.bin_dimension, self.resolutionAct, self.resolutionH, False,   self.ZRotNum,
-                           args['shotInfo'], self.scale)
+                           args['shotInfo'], self.scale, self.dicPath)
 
         if self.evaluate and self.dataname is not None:
             self.item_creator = LoadItemCreator(data_name=self.dataname)
@@ -131,10 +142,14 @@ class PackingGame(gym.Env):
         self.episodeCounter = (self.episodeCounter + 1) % self.updatePeriod
         if self.episodeCounter == 0 or self.interface is None:
             if self.interface is not None:
-                self.interface.close()
+                # The connection stays, collision shapes built so far are reused by the new Interface.
+                self.interface.close(keepConnection=True)
                 del self.interface
             self.interface = Interface(bin=self.bin_dimension, foldername=self.objPath, visual=self.visual,
-                                       scale=self.scale, simulationScale=self.meshScale, maxBatch=self.maxBatch,)
+                                       scale=self.scale, simulationScale=self.meshScale, maxBatch=self.maxBatch,
+                                       catalog=self.catalog, properties=self.properties,
+                                       checkEvery=self.settleCheckEvery, stableWindow=self.settleWindow,
+                                       freezeAfter=self.freezeAfter)
         else:
             self.interface.reset()
         self.item_creator.reset(index)
@@ -146,14 +161,20 @@ class PackingGame(gym.Env):
         self.id = None
         return self.cur_observation()
 
+    def get_volume(self, item_ID):
+        if self.properties is not None:
+            # The table holds volumes at file scale, the bin is in env units (file * meshScale).
+            return self.properties.volume(item_ID) * self.meshScale ** 3
+        return self.infoDict[item_ID][0]['volume']
+
     def get_ratio(self):
         totalVolume = 0
         for idx in range(self.item_idx):
-            totalVolume += self.infoDict[int(self.item_vec[idx][0])][0]['volume']
+            totalVolume += self.get_volume(int(self.item_vec[idx][0]))
         return totalVolume / np.prod(self.bin_dimension)
 
     def get_item_ratio(self, next_item_ID):
-        return self.infoDict[next_item_ID][0]['volume'] / np.prod(self.bin_dimension)
+        return self.get_volume(next_item_ID) / np.prod(self.bin_dimension)
 
     def gen_next_item_ID(self):
         return self.item_creator.preview(1)[0]
@@ -183,8 +204,8 @@ class PackingGame(gym.Env):
     def cur_observation(self, genItem = True, draw = False):
         if self.item_idx != 0:
             positions, orientations = self.interface.getAllPositionAndOrientation(inner=False)
-            self.item_vec[0:self.item_idx, 1:4] = np.array([positions[0:self.item_idx]])
-            self.item_vec[0:self.item_idx, 4:8] = np.array([orientations[0:self.item_idx]])
+            self.item_vec[0:self.item_idx, 1:4] = positions[0:self.item_idx]
+            self.item_vec[0:self.item_idx, 4:8] = orientations[0:self.item_idx]
         if not self.chooseItem:
             if genItem:
                 self.next_item_ID = self.gen_next_item_ID()
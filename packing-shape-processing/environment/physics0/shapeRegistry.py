@@ -0,0 +1,82 @@
+import os
+import tempfile
+import trimesh
+import numpy as np
+import pybullet as p
+
+# Process wide store of the shapes Interface spawns, shared by every Interface of the process.
+#   meshes  (path, meshScale) -> (trimesh, convex hull vertices), parsed once per process (or sliced from a
+#           ShapeCatalog, the pre-baked binary of pipeline/catalog.py), they outlive every Interface and connection.
+#   shapes  (kind, path, meshScale, options) -> PyBullet shape id, reused by every Interface on the connection.
+#           Shape ids belong to the connection, forget() drops them when it is closed.
+# Given a catalog holding the shape, shapes are built from its arrays: a single convex part or the visual mesh
+# directly from the vertices, several convex parts through an OBJ with one object per part, written once per
+# process from the catalog, since PyBullet builds compound shapes from files only.
+
+class ShapeRegistry(object):
+    def __init__(self):
+        self.meshes = {}
+        self.shapes = {}
+        self.partsDir = None
+
+    def mesh(self, path, meshScale, catalog = None, name = None):
+        key = (path, tuple(np.round(meshScale, 9)))
+        if key not in self.meshes:
+            if catalog is not None and name in catalog:
+                mesh = catalog.mesh(name)
+                hull = np.array(catalog.hull(name), dtype=np.float64) * meshScale[0]
+            else:
+                mesh = trimesh.load(path)
+                hull = None
+            mesh.apply_scale(meshScale[0])
+            if hull is None:
+                hull = mesh.convex_hull.vertices
+            self.meshes[key] = (mesh, np.ascontiguousarray(hull, dtype=np.float64))
+        return self.meshes[key]
+
+    def _shape(self, kind, create, path, meshScale, source = None, **options):
+        key = (kind, path, tuple(np.round(meshScale, 9)), repr(sorted(options.items())))
+        if key not in self.shapes:
+            geometry = source() if source is not None else {'fileName': path}
+            self.shapes[key] = create(shapeType=p.GEOM_MESH, meshScale=meshScale, **geometry, **options)
+        return self.shapes[key]
+
+    def _partsFile(self, catalog, name):
+        if self.partsDir is None:
+            self.partsDir = tempfile.mkdtemp(prefix='catalogParts')
+        path = os.path.join(self.partsDir, '{}.obj'.format(name))
+        if not os.path.exists(path):
+            lines, offset = [], 1
+            for index, part in enumerate(catalog.parts(name)):
+                faces = trimesh.convex.convex_hull(np.asarray(part, dtype=np.float64)).faces
+                lines += ['o part{}\n'.format(index)]
+                lines += ['v {:.8f} {:.8f} {:.8f}\n'.format(*v) for v in part]
+                lines += ['f {} {} {}\n'.format(*(f + offset)) for f in faces]
+                offset += len(part)
+            with open(path, 'w') as f:
+                f.writelines(lines)
+        return path
+
+    def _collisionSource(self, catalog, name):
+        parts = catalog.parts(name)
+        if len(parts) == 1:
+            return {'vertices': np.asarray(parts[0], dtype=np.float64).tolist()}
+        return {'fileName': self._partsFile(catalog, name)}
+
+    def collisionShape(self, path, meshScale, catalog = None, name = None, **options):
+        if catalog is not None and name in catalog:
+            return self._shape('collision', p.createCollisionShape, (catalog.path, name), meshScale,
+                               lambda: self._collisionSource(catalog, name), **options)
+        return self._shape('collision', p.createCollisionShape, path, meshScale, **options)
+
+    def visualShape(self, path, meshScale, catalog = None, name = None, **options):
+        if catalog is not None and name in catalog:
+            return self._shape('visual', p.createVisualShape, (catalog.path, name), meshScale,
+                               lambda: {'vertices': np.asarray(catalog.vertices(name), dtype=np.float64).tolist(),
+                                        'indices': np.asarray(catalog.faces(name)).reshape(-1).tolist()}, **options)
+        return self._shape('visual', p.createVisualShape, path, meshScale, **options)
+
+    def forget(self):
+        self.shapes = {}
+
+shapeRegistry = ShapeRegistry()
@@ -12,7 +12,7 @@ def draw_heatmap(heightMap, vmin = 0, vmax = 0.32):
 
 # Record heightMap for heuristic things.
 class Space(object):
-    def __init__(self, bin_dimension, resolutionAct, resolutionH, boxPack = False,  ZRotNum = None, shotInfo = None, scale = None):
+    def __init__(self, bin_dimension, resolutionAct, resolutionH, boxPack = False,  ZRotNum = None, shotInfo = None, scale = None, id2shape = None):
         self.bin_dimension = bin_dimension
         self.resolutionH = resolutionH
         self.resolutionAct = resolutionAct
@@ -28,6 +28,10 @@ class Space(object):
             gen_ray_origin_direction(self.rangeX_C, self.rangeY_C, resolutionH, boxPack, shift = 0.001)
 
         # self.pack_meshes = []
+        if isinstance(shotInfo, str):
+            # Atlas folder written by 3_10_shot_info.py, memory mapped on the first lookup.
+            from pipeline.heightmaps import ShotAtlas
+            shotInfo = ShotAtlas(shotInfo, id2shape)
         self.shotInfo = shotInfo
 
         self.transformation = []
@@ -94,6 +98,14 @@ class Space(object):
             np.maximum(self.heightmapC[coorX:coorX + rangeX_O, coorY:coorY + rangeY_O], heightMapH)
 
 
+    def shot_window(self, heightMap, rangeX_OH, rangeY_OH, next_item_ID):
+        # A precomputed shot sets the window. It has to be the shot of the shapeDict mesh, i.e. the same
+        # 10_*_vhacd_with_pose file at the same meshScale (see 3_10_shot_info.py), so the sizes agree.
+        shotX, shotY = heightMap.shape
+        assert shotX == rangeX_OH and shotY == rangeY_OH, \
+            'shot of item {} is {}x{} cells, its mesh needs {}x{}'.format(next_item_ID, shotX, shotY, rangeX_OH, rangeY_OH)
+        return shotX, shotY
+
     # 动作设计，还没想好怎么做(感觉这玩意还挺关键的，因为动作空间会很大)
     def get_possible_position(self, next_item_ID, next_item, selectedAction):
 
@@ -106,6 +118,7 @@ class Space(object):
             rangeX_OA, rangeY_OA = np.ceil(boundingSize[0:2] / self.resolutionAct).astype(np.int32)
             if self.shotInfo is not None:
                 heightMapT, heightMapB, maskH, maskB = self.shotInfo[next_item_ID][rotIdx] # 这个操作很省运算量，之后也可以考虑用进来
+                rangeX_OH, rangeY_OH = self.shot_window(heightMapB, rangeX_OH, rangeY_OH, next_item_ID)
             else:
                 heightMapT, heightMapB, maskH, maskB = shot_item(next_item[rotIdx],
                                                                  self.ray_origins,
@@ -204,6 +217,7 @@ class Space(object):
                 heightMapT, heightMapB, maskH, maskB = self.shotInfo[next_item_ID][rotIdx]
                 boundingSize = np.round(next_item[rotIdx].extents, decimals=6)
                 rangeX_OH, rangeY_OH = np.ceil(boundingSize[0:2] / self.resolutionH).astype(np.int32)
+                rangeX_OH, rangeY_OH = self.shot_window(heightMapB, rangeX_OH, rangeY_OH, next_item_ID)
                 for coorX in range(self.rangeX_A):
                     for coorY in range(self.rangeY_A):
                         if self.naiveMask[rotIdx, coorX, coorY] == 0:
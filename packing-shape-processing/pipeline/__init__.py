@@ -0,0 +1 @@
+from .runner import loadStage, runStage, runPipeline
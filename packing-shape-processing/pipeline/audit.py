@@ -0,0 +1,51 @@
+import os
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from .meshio import readMesh, mergeVertices
+
+# Watertightness audit on raw vertex / face arrays and the columnar report it produces.
+# A closed manifold surface has every undirected edge shared by exactly two faces.
+
+columns = ['names', 'watertight', 'genus', 'faces', 'volume']
+
+def edgeCounts(faces):
+    edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    keys = edges[:, 0] * (int(faces.max()) + 1) + edges[:, 1]
+    unique, counts = np.unique(keys, return_counts=True)
+    return unique, counts, edges
+
+def auditMesh(path):
+    vertices, faces = mergeVertices(*readMesh(path))
+    if len(faces) == 0:
+        return os.path.basename(path), False, -1, 0, 0.0
+    _, counts, edges = edgeCounts(faces)
+    watertight = bool(np.all(counts == 2))
+
+    genus = -1
+    if watertight:
+        # Euler characteristic V - E + F = 2 * (components - genus) for closed orientable surfaces.
+        used = np.unique(faces)
+        graph = coo_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(len(vertices), len(vertices)))
+        components = connected_components(graph, directed=False)[0] - (len(vertices) - len(used))
+        euler = len(used) - len(counts) + len(faces)
+        genus = int((2 * components - euler) // 2)
+
+    triangles = vertices[faces]
+    volume = float(np.sum(triangles[:, 0] * np.cross(triangles[:, 1], triangles[:, 2])) / 6)
+    return os.path.basename(path), watertight, genus, len(faces), volume
+
+def writeReport(path, rows):
+    rows = [row for row in rows if row is not None]
+    names, watertight, genus, faces, volume = zip(*rows) if rows else ([], [], [], [], [])
+    np.savez(path, names=np.array(names, dtype=str), watertight=np.array(watertight, dtype=bool),
+             genus=np.array(genus, dtype=np.int32), faces=np.array(faces, dtype=np.int64),
+             volume=np.array(volume, dtype=np.float64))
+
+def loadReport(path):
+    report = np.load(path)
+    return {key: report[key] for key in columns}
+
+def watertightNames(path):
+    report = loadReport(path)
+    return [str(name) for name in report['names'][report['watertight']]]
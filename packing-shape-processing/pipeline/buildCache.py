@@ -0,0 +1,74 @@
+import os
+import json
+import hashlib
+
+# Manifest based build cache for the numbered stages.
+# Every processed mesh is recorded as
+#   item -> {'key': hash(input file contents + stage parameters), 'outputs': [files it produced]}
+# and is only rebuilt when its key changes or one of its outputs went missing.
+# Since a stage's inputs are the upstream stage's outputs, a rebuilt mesh also
+# invalidates its downstream artifacts on the next stage.
+
+def fileHash(path, blockSize = 1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(blockSize)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+def paramsHash(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+def itemKey(inputs, params):
+    h = hashlib.sha1(paramsHash(params).encode())
+    for path in inputs:
+        h.update(os.path.basename(path).encode())
+        h.update(fileHash(path).encode() if os.path.exists(path) else b'missing')
+    return h.hexdigest()
+
+def isCacheable(stage):
+    return hasattr(stage, 'itemInputs') and hasattr(stage, 'itemOutputs')
+
+def isFresh(record, key):
+    if record is None or record['key'] != key:
+        return False
+    return all(os.path.exists(path) for path in record['outputs'])
+
+def removeOutputs(record):
+    # Parameters or inputs changed, so whatever the mesh produced before is stale.
+    if record is None:
+        return
+    for path in record['outputs']:
+        if os.path.isfile(path):
+            os.remove(path)
+
+class BuildCache(object):
+    def __init__(self, stageName, cacheDir, saveInterval = 100):
+        self.manifestPath = os.path.join(cacheDir, stageName + '.json')
+        self.saveInterval = saveInterval
+        self.dirty = 0
+        os.makedirs(cacheDir, exist_ok=True)
+        if os.path.exists(self.manifestPath):
+            with open(self.manifestPath, 'r') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {}
+
+    def lookup(self, item):
+        return self.manifest.get(item)
+
+    def record(self, item, key, outputs):
+        self.manifest[item] = {'key': key, 'outputs': list(outputs)}
+        self.dirty += 1
+        if self.dirty >= self.saveInterval:
+            self.save()
+
+    def save(self):
+        tmpPath = self.manifestPath + '.tmp'
+        with open(tmpPath, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmpPath, self.manifestPath)
+        self.dirty = 0
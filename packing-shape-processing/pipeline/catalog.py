@@ -0,0 +1,171 @@
+import os
+import json
+import shutil
+import numpy as np
+
+# Packed binary shape catalog.
+#   magic (8 bytes) | header length (int64) | JSON header | padding to 64 bytes | array sections
+# The header holds the shape names and the byte offset, dtype and shape of every section:
+#   index       int64   (N_shapes, 12) start/count of each shape in vertices, faces, hull, points, parts, partSizes
+#   vertices    float32 (N_v, 3)
+#   faces       int32   (N_f, 3), indices local to the shape
+#   hull        float32 (N_h, 3) convex hull vertices
+#   transforms  float64 (N_shapes, 4, 4) pose of the shape
+#   points      float32 (N_p, 3) surface samples, may be empty
+#   parts       float32 (N_c, 3) vertices of the convex parts (the objects of the V-HACD OBJ), back to back
+#   partSizes   int64   (N_parts, 1) vertex count of every convex part
+# Every section is opened with numpy.memmap, so shapes are sliced without parsing OBJ files.
+# The header lists the index columns, catalogs written before parts existed have the first four only.
+
+MAGIC = b'PKCAT001'
+ALIGN = 64
+sections = ['vertices', 'faces', 'hull', 'points', 'parts', 'partSizes']
+dtypes = {'index': np.int64, 'vertices': np.float32, 'faces': np.int32, 'hull': np.float32,
+          'transforms': np.float64, 'points': np.float32, 'parts': np.float32, 'partSizes': np.int64}
+widths = {'vertices': 3, 'faces': 3, 'hull': 3, 'points': 3, 'parts': 3, 'partSizes': 1}
+
+class CatalogWriter(object):
+    # Streams every section into its own temporary file, so memory stays bounded by one shape.
+    def __init__(self, path):
+        self.path = path
+        self.names = []
+        self.index = []
+        self.counts = {key: 0 for key in sections}
+        self.tmpPaths = {key: path + '.{}.tmp'.format(key) for key in sections + ['transforms']}
+        self.files = {key: open(tmpPath, 'wb') for key, tmpPath in self.tmpPaths.items()}
+
+    def add(self, name, vertices, faces, hull, transform, points = None, parts = None):
+        # parts: vertices of every convex part, defaults to the hull as the only part.
+        parts = parts if parts is not None else [hull]
+        arrays = {'vertices': vertices, 'faces': faces, 'hull': hull,
+                  'points': points if points is not None else np.zeros((0, 3)),
+                  'parts': np.concatenate([np.reshape(part, (-1, 3)) for part in parts]),
+                  'partSizes': [len(np.reshape(part, (-1, 3))) for part in parts]}
+        row = []
+        for key in sections:
+            data = np.ascontiguousarray(arrays[key], dtype=dtypes[key]).reshape(-1, widths[key])
+            self.files[key].write(data.tobytes())
+            row += [self.counts[key], len(data)]
+            self.counts[key] += len(data)
+        self.files['transforms'].write(np.ascontiguousarray(transform, dtype=dtypes['transforms']).reshape(4, 4).tobytes())
+        self.names.append(name)
+        self.index.append(row)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        index = np.array(self.index, dtype=dtypes['index']).reshape(-1, 2 * len(sections))
+        layout = [('index', index.shape, None)]
+        layout += [(key, (self.counts[key], widths[key]), self.tmpPaths[key]) for key in sections]
+        layout += [('transforms', (len(self.names), 4, 4), self.tmpPaths['transforms'])]
+
+        header = {'names': self.names, 'columns': sections, 'sections': {}}
+        offset = 0
+        for key, shape, _ in layout:
+            header['sections'][key] = {'offset': offset, 'shape': list(shape), 'dtype': np.dtype(dtypes[key]).str}
+            offset += _aligned(int(np.prod(shape)) * np.dtype(dtypes[key]).itemsize)
+        headerBytes = json.dumps(header).encode()
+        dataStart = _aligned(len(MAGIC) + 8 + len(headerBytes))
+
+        tmpPath = self.path + '.tmp'
+        with open(tmpPath, 'wb') as out:
+            out.write(MAGIC)
+            out.write(np.int64(len(headerBytes)).tobytes())
+            out.write(headerBytes)
+            for key, shape, sourcePath in layout:
+                out.seek(dataStart + header['sections'][key]['offset'])
+                if sourcePath is None:
+                    out.write(index.tobytes())
+                else:
+                    with open(sourcePath, 'rb') as source:
+                        shutil.copyfileobj(source, out)
+            out.truncate(dataStart + offset)
+        os.replace(tmpPath, self.path)
+        for tmp in self.tmpPaths.values():
+            os.remove(tmp)
+
+def _aligned(size):
+    return (size + ALIGN - 1) // ALIGN * ALIGN
+
+class ShapeCatalog(object):
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            assert f.read(len(MAGIC)) == MAGIC, 'not a shape catalog: {}'.format(path)
+            headerLength = int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+            header = json.loads(f.read(headerLength).decode())
+        dataStart = _aligned(len(MAGIC) + 8 + headerLength)
+
+        self.names = header['names']
+        self.columns = header.get('columns', sections[0:4])
+        self.slots = {name: slot for slot, name in enumerate(self.names)}
+        self.arrays = {}
+        for key, section in header['sections'].items():
+            shape = tuple(section['shape'])
+            if int(np.prod(shape)) == 0:
+                self.arrays[key] = np.zeros(shape, dtype=section['dtype'])
+            else:
+                self.arrays[key] = np.memmap(path, dtype=section['dtype'], mode='r',
+                                             offset=dataStart + section['offset'], shape=shape)
+
+    def __contains__(self, name):
+        return name in self.slots
+
+    def __len__(self):
+        return len(self.names)
+
+    def _section(self, key, name):
+        if key not in self.columns:
+            return np.zeros((0, widths[key]), dtype=dtypes[key])
+        row = self.arrays['index'][self.slots[name]]
+        column = self.columns.index(key) * 2
+        start, count = int(row[column]), int(row[column + 1])
+        return self.arrays[key][start:start + count]
+
+    def vertices(self, name):
+        return self._section('vertices', name)
+
+    def faces(self, name):
+        return self._section('faces', name)
+
+    def hull(self, name):
+        return self._section('hull', name)
+
+    def points(self, name):
+        return self._section('points', name)
+
+    def parts(self, name):
+        # Convex parts of the collision shape, old catalogs give the hull as the only part.
+        sizes = self._section('partSizes', name).reshape(-1)
+        if len(sizes) == 0:
+            return [self.hull(name)]
+        return np.split(self._section('parts', name), np.cumsum(sizes)[0:-1])
+
+    def transform(self, name):
+        return self.arrays['transforms'][self.slots[name]]
+
+    def mesh(self, name):
+        import trimesh
+        return trimesh.Trimesh(vertices=np.array(self.vertices(name), dtype=np.float64),
+                               faces=np.array(self.faces(name)), process=False)
+
+def exportShape(catalog, name, path):
+    # Writes the mesh of name as an OBJ for tools that only read files (the Blender renderers), once.
+    if not os.path.exists(path):
+        from .meshio import writeObj
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmpPath = path + '.{}.tmp'.format(os.getpid())
+        writeObj(tmpPath, np.asarray(catalog.vertices(name)), np.asarray(catalog.faces(name)))
+        os.replace(tmpPath, path)
+    return path
+
+def catalogShapeDict(catalog, id2shape, ZRotNum, meshScale = 1):
+    # shapeDict of PackingGame / Space from the catalog: item id -> its mesh at meshScale in every Z rotation,
+    # the rotations of 3_10_shot_info.py.
+    from .heightmaps import shapeName, zRotations
+    shapeDict = {}
+    for id in range(len(id2shape)):
+        mesh = catalog.mesh(shapeName(id, id2shape))
+        mesh.apply_scale(meshScale)
+        shapeDict[id] = [mesh.copy().apply_transform(rotation) for rotation in zRotations(ZRotNum)]
+    return shapeDict
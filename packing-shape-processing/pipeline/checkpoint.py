@@ -0,0 +1,62 @@
+import os
+import json
+import time
+import pickle
+
+# Progress of a stage run, so an interrupted run resumes where it stopped.
+#   <stage>.checkpoint.pkl   {'done': {item: what processItem returned}} for the run in progress,
+#                            removed once the stage completed
+#   <stage>.quarantine.json  {item: reason} of meshes that failed, timed out or killed their worker,
+#                            kept across runs so they are not tried again
+# Both files are written to a temporary file first and moved in place, an interruption never leaves half a file.
+
+def _atomicWrite(path, data, binary = False):
+    tmpPath = path + '.tmp'
+    with open(tmpPath, 'wb' if binary else 'w') as f:
+        f.write(data)
+    os.replace(tmpPath, path)
+
+class Checkpoint(object):
+    def __init__(self, stageName, checkpointDir, saveSeconds = 10.0):
+        os.makedirs(checkpointDir, exist_ok=True)
+        self.checkpointPath = os.path.join(checkpointDir, stageName + '.checkpoint.pkl')
+        self.quarantinePath = os.path.join(checkpointDir, stageName + '.quarantine.json')
+        self.saveSeconds = saveSeconds
+        self.lastSave = time.time()
+        self.done = {}
+        self.quarantined = {}
+        if os.path.exists(self.checkpointPath):
+            with open(self.checkpointPath, 'rb') as f:
+                self.done = pickle.load(f)['done']
+        if os.path.exists(self.quarantinePath):
+            with open(self.quarantinePath, 'r') as f:
+                self.quarantined = json.load(f)
+
+    def markDone(self, item, result):
+        self.done[item] = result
+        self.quarantined.pop(item, None)
+        self.saveIfDue()
+
+    def quarantine(self, item, reason):
+        self.quarantined[item] = reason
+        self.saveIfDue()
+
+    def release(self, items):
+        # Give quarantined meshes another try.
+        for item in items:
+            self.quarantined.pop(item, None)
+
+    def saveIfDue(self):
+        if time.time() - self.lastSave >= self.saveSeconds:
+            self.save()
+
+    def save(self):
+        _atomicWrite(self.checkpointPath, pickle.dumps({'done': self.done}), binary=True)
+        _atomicWrite(self.quarantinePath, json.dumps(self.quarantined, indent=1))
+        self.lastSave = time.time()
+
+    def complete(self):
+        # The stage went through: the next run starts over (the build cache still skips unchanged meshes).
+        _atomicWrite(self.quarantinePath, json.dumps(self.quarantined, indent=1))
+        if os.path.exists(self.checkpointPath):
+            os.remove(self.checkpointPath)
@@ -0,0 +1,112 @@
+import numpy as np
+from skimage.measure import marching_cubes
+
+# Watertight reconstruction by depth fusion, the same recipe as mesh-fusion (scale, render, fuse, marching cubes)
+# but without leaving the process: the mesh is scaled into the unit cube, depth maps are rendered on the CPU
+# from views spread over a sphere, each one is fused into a truncated signed distance volume right after
+# rendering, and the zero level set of the volume is extracted with marching cubes.
+# Depth maps are orthographic and cover [-halfWidth, halfWidth]^2 so every voxel of the unit cube projects into them.
+
+halfWidth = np.sqrt(3) / 2
+
+def normalize(vertices, padding = 0.1):
+    # Center the bounding box at the origin and scale its longest side to 1 - padding.
+    lo, hi = vertices.min(axis=0), vertices.max(axis=0)
+    center = (lo + hi) / 2
+    scale = (1 - padding) / max(np.max(hi - lo), 1e-12)
+    return (vertices - center) * scale, center, scale
+
+def viewRotations(views):
+    # Fibonacci lattice of camera directions, each turned into a rotation whose third row is the direction.
+    k = np.arange(views) + 0.5
+    z = 1 - 2 * k / views
+    phi = np.pi * (1 + np.sqrt(5)) * k
+    r = np.sqrt(1 - z ** 2)
+    directions = np.stack([r * np.cos(phi), r * np.sin(phi), z], axis=1)
+
+    rotations = []
+    for d in directions:
+        up = np.array([0, 0, 1.0]) if abs(d[2]) < 0.9 else np.array([1.0, 0, 0])
+        x = np.cross(up, d)
+        x /= np.linalg.norm(x)
+        rotations.append(np.stack([x, np.cross(d, x), d]))
+    return np.array(rotations)
+
+def renderDepth(vertices, faces, resolution, budget = 1 << 21):
+    # Orthographic z-buffer looking down -z, the largest z per pixel wins, -inf where nothing was hit.
+    # Every triangle is tested against the pixel centers of its bounding box, budget bounds the pixels tested at once.
+    pixels = (vertices[:, 0:2] + halfWidth) * (resolution / (2 * halfWidth)) - 0.5
+    tri = pixels[faces]
+    triZ = vertices[faces, 2]
+    lo = np.clip(np.ceil(tri.min(axis=1)), 0, resolution).astype(np.int64)
+    hi = np.clip(np.floor(tri.max(axis=1)), -1, resolution - 1).astype(np.int64)
+    width = np.maximum(hi - lo + 1, 0)
+    counts = width[:, 0] * width[:, 1]
+
+    depth = np.full(resolution * resolution, -np.inf)
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(faces):
+        stop = max(np.searchsorted(ends, ends[start] - counts[start] + budget, side='right'), start + 1)
+        ids = np.repeat(np.arange(start, stop), counts[start:stop])
+        local = np.arange(len(ids)) - np.repeat(ends[start:stop] - counts[start:stop] - (ends[start] - counts[start]), counts[start:stop])
+        px = lo[ids, 0] + local // width[ids, 1]
+        py = lo[ids, 1] + local % width[ids, 1]
+
+        a, b, c = tri[ids, 0], tri[ids, 1], tri[ids, 2]
+        area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+        area = np.where(area == 0, np.inf, area)
+        u = ((b[:, 0] - px) * (c[:, 1] - py) - (b[:, 1] - py) * (c[:, 0] - px)) / area
+        v = ((c[:, 0] - px) * (a[:, 1] - py) - (c[:, 1] - py) * (a[:, 0] - px)) / area
+        w = 1 - u - v
+        inside = (u >= 0) & (v >= 0) & (w >= 0) & np.isfinite(area)
+        z = u * triZ[ids, 0] + v * triZ[ids, 1] + w * triZ[ids, 2]
+        np.maximum.at(depth, px[inside] * resolution + py[inside], z[inside])
+        start = stop
+    return depth.reshape(resolution, resolution)
+
+def fuse(vertices, faces, resolution = 128, views = 100, truncation = 10, renderResolution = None):
+    # Returns the fused volume (resolution^3, negative inside) over the voxel centers of [-0.5, 0.5]^3.
+    # Only one depth map is alive at a time, the volume is updated in place with float32 buffers.
+    renderResolution = renderResolution or 2 * resolution
+    axis = ((np.arange(resolution) + 0.5) / resolution - 0.5).astype(np.float32)
+    centers = np.stack(np.meshgrid(axis, axis, axis, indexing='ij')).reshape(3, -1)
+    trunc = np.float32(truncation / resolution)
+    pixelScale = np.float32(renderResolution / (2 * halfWidth))
+    # Pixel centers sit on integer coordinates, adding half a pixel turns the truncation below into rounding.
+    pixelOffset = np.float32(halfWidth * pixelScale)
+
+    tsdf = np.zeros(centers.shape[1], dtype=np.float32)
+    weight = np.zeros(centers.shape[1], dtype=np.float32)
+    for rotation in viewRotations(views):
+        depth = renderDepth(vertices @ rotation.T, faces, renderResolution).astype(np.float32).reshape(-1)
+        view = rotation.astype(np.float32) @ centers
+        view[0:2] *= pixelScale
+        view[0:2] += pixelOffset
+        np.clip(view[0:2], 0, renderResolution - 1, out=view[0:2])
+        pixel = view[0:2].astype(np.int32)
+        pixel[0] *= renderResolution
+        pixel[0] += pixel[1]
+        # Positive between the camera and the surface, voxels far behind the surface are occluded and left alone.
+        sdf = view[2] - depth[pixel[0]]
+        update = sdf >= -trunc
+        np.minimum(sdf, trunc, out=sdf)
+        sdf /= trunc
+        # Running mean over the views that saw the voxel.
+        weight += update
+        sdf -= tsdf
+        np.divide(sdf, weight, out=sdf, where=update)
+        np.add(tsdf, sdf, out=tsdf, where=update)
+    # Never seen from outside by any view: inside.
+    tsdf[weight == 0] = -1
+    return tsdf.reshape(resolution, resolution, resolution)
+
+def reconstruct(vertices, faces, resolution = 128, views = 100, truncation = 10, padding = 0.1):
+    # Watertight surface of (vertices, faces) in the coordinates of the input mesh.
+    scaled, center, scale = normalize(np.asarray(vertices, dtype=np.float64), padding)
+    tsdf = fuse(scaled, np.asarray(faces, dtype=np.int64), resolution, views, truncation)
+    # An outside border closes the surface where the volume touches the cube.
+    tsdf = np.pad(tsdf, 1, constant_values=1)
+    outVertices, outFaces, _, _ = marching_cubes(tsdf, level=0)
+    outVertices = (outVertices - 0.5) / resolution - 0.5
+    return outVertices / scale + center, outFaces
@@ -0,0 +1,49 @@
+import numpy as np
+import transforms3d
+
+# Array based helpers shared by the pose stages.
+# The bounds of a rigidly moved mesh only depend on its convex hull vertices,
+# so all the yaw sweeps work on a small (N, 3) hull array instead of copying meshes.
+
+def extendMat(mat3, translation = None):
+    mat4 = np.eye(4)
+    mat4[0:3,0:3] = mat3
+    if translation is not None:
+        mat4[0:3,3] = translation
+    return mat4
+
+def transformPoints(points, T):
+    return np.dot(points, T[0:3, 0:3].T) + T[0:3, 3]
+
+def yawAngles(grain):
+    return np.arange(grain) * np.pi * 2 / grain
+
+def yawMat(angle):
+    return extendMat(transforms3d.euler.euler2mat(0, 0, angle, 'sxyz'))
+
+def yawExtents(points, angles):
+    # Rotate the xy projection by every angle at once, (N_angles, N_points) each.
+    cos, sin = np.cos(angles)[:, None], np.sin(angles)[:, None]
+    x, y = points[:, 0][None, :], points[:, 1][None, :]
+    rotX = cos * x - sin * y
+    rotY = sin * x + cos * y
+    extentX = rotX.max(axis=1) - rotX.min(axis=1)
+    extentY = rotY.max(axis=1) - rotY.min(axis=1)
+    return extentX, extentY
+
+def minAreaYaw(points, grain = 360 * 4):
+    # Same result as rotating the mesh grain times and reading extents[0] * extents[1].
+    angles = yawAngles(grain)
+    extentX, extentY = yawExtents(points, angles)
+    bestAngle = int(np.argmin(extentX * extentY))
+    return bestAngle, yawMat(angles[bestAngle])
+
+def canonicalYaw(points, comOffset, grain = 360):
+    # Min-area yaw among the angles with extents[0] <= extents[1] that leave the center of mass
+    # on the -y side of the centroid. comOffset is center_mass - centroid of the posed mesh.
+    angles = yawAngles(grain)
+    extentX, extentY = yawExtents(points, angles)
+    comY = np.sin(angles) * comOffset[0] + np.cos(angles) * comOffset[1]
+    candidates = np.flatnonzero((extentX <= extentY) & (comY <= 0))
+    bestAngle = int(candidates[np.argmin(extentX[candidates] * extentY[candidates])])
+    return bestAngle, yawMat(angles[bestAngle])
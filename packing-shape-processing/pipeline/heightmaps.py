@@ -0,0 +1,110 @@
+import os
+import numpy as np
+import transforms3d
+from .occupancy import columnCrossings
+
+# Top / bottom heightmaps of every posed shape in every Z rotation, the shotInfo used by Space.
+# A shot is a (4, rangeX, rangeY) float32 array: top heights, bottom heights, top mask, bottom mask, the same
+# four maps shot_item ray casts, with column i at i * resolutionH + shift from the minimum corner of the shape.
+# All shots are kept in one atlas directory:
+#   shots.bin  raw float32 shots back to back
+#   index.npz  names, ZRotNum, offsets (N, ZRotNum) in floats and sizes (N, ZRotNum, 2)
+
+def _paths(atlasDir):
+    return os.path.join(atlasDir, 'shots.bin'), os.path.join(atlasDir, 'index.npz')
+
+def shapeName(key, id2shape = None):
+    # Item ids go through id2shape (dicPath); 'category/name_0.obj' and 'name_0' both give 'name_0'.
+    if not isinstance(key, str):
+        key = id2shape[int(key)]
+    name = os.path.basename(key)
+    return name[0:-4] if name.lower().endswith(('.obj', '.off')) else name
+
+def zRotations(ZRotNum):
+    return [np.array(transforms3d.affines.compose(np.zeros(3), transforms3d.euler.euler2mat(0, 0, np.pi * 2 * k / ZRotNum), np.ones(3)))
+            for k in range(ZRotNum)]
+
+def shotMesh(triangles, resolutionH, shift = 0.001):
+    # Vertical rays through the columns of the shape moved to the origin, first hits from above and from below.
+    triangles = triangles - triangles.reshape(-1, 3).min(axis=0)
+    extents = np.round(triangles.reshape(-1, 3).max(axis=0), decimals=6)
+    rangeX, rangeY = np.ceil(extents[0:2] / resolutionH).astype(np.int32)
+    grid = np.meshgrid(np.arange(rangeX), np.arange(rangeY), indexing='ij')
+    columns = np.stack(grid, axis=-1).reshape(-1, 2) * resolutionH + shift
+
+    hitColumns, hitZ = columnCrossings(triangles, columns)
+    top = np.full(len(columns), -np.inf)
+    bottom = np.full(len(columns), np.inf)
+    np.maximum.at(top, hitColumns, hitZ)
+    np.minimum.at(bottom, hitColumns, hitZ)
+    maskT, maskB = np.isfinite(top), np.isfinite(bottom)
+    shot = np.stack([np.where(maskT, top, 0), np.where(maskB, bottom, 0), maskT, maskB])
+    return shot.reshape(4, rangeX, rangeY).astype(np.float32)
+
+def shotRotations(mesh, ZRotNum, resolutionH, shift = 0.001):
+    triangles = np.asarray(mesh.triangles)
+    return [shotMesh(triangles @ rotation[0:3, 0:3].T, resolutionH, shift) for rotation in zRotations(ZRotNum)]
+
+def writeAtlas(atlasDir, entries, ZRotNum):
+    # entries: (name, [shot of every rotation]) pairs, streamed to disk one shape at a time.
+    os.makedirs(atlasDir, exist_ok=True)
+    shotsPath, indexPath = _paths(atlasDir)
+    names, offsets, sizes = [], [], []
+    offset = 0
+    with open(shotsPath + '.tmp', 'wb') as f:
+        for name, shots in entries:
+            assert len(shots) == ZRotNum
+            names.append(name)
+            offsets.append([])
+            sizes.append([])
+            for shot in shots:
+                f.write(np.ascontiguousarray(shot, dtype=np.float32).tobytes())
+                offsets[-1].append(offset)
+                sizes[-1].append(shot.shape[1:3])
+                offset += shot.size
+    np.savez(indexPath + '.tmp.npz', names=np.array(names), ZRotNum=ZRotNum,
+             offsets=np.array(offsets, dtype=np.int64).reshape(-1, ZRotNum), sizes=np.array(sizes, dtype=np.int64).reshape(-1, ZRotNum, 2))
+    os.replace(shotsPath + '.tmp', shotsPath)
+    os.replace(indexPath + '.tmp.npz', indexPath)
+
+class ShotAtlas:
+    # Lazy shotInfo: nothing is read before the first lookup, then shots are views into the memory mapped file.
+    # Shapes are looked up by name or, given id2shape (dicPath), by item id.
+
+    def __init__(self, atlasDir, id2shape = None):
+        self.atlasDir = atlasDir
+        self.id2shape = id2shape
+        self.data = None
+        self.cache = {}
+
+    def open(self):
+        shotsPath, indexPath = _paths(self.atlasDir)
+        index = np.load(indexPath)
+        self.slots = {str(name): slot for slot, name in enumerate(index['names'])}
+        self.ZRotNum = int(index['ZRotNum'])
+        self.offsets, self.sizes = index['offsets'], index['sizes']
+        self.data = np.memmap(shotsPath, dtype=np.float32, mode='r') if os.path.getsize(shotsPath) > 0 else np.zeros(0, dtype=np.float32)
+
+    def shapeName(self, key):
+        return shapeName(key, self.id2shape)
+
+    def __contains__(self, key):
+        if self.data is None:
+            self.open()
+        return self.shapeName(key) in self.slots
+
+    def __len__(self):
+        if self.data is None:
+            self.open()
+        return len(self.slots)
+
+    def __getitem__(self, key):
+        if key not in self.cache:
+            if self.data is None:
+                self.open()
+            slot = self.slots[self.shapeName(key)]
+            shots = []
+            for offset, (rangeX, rangeY) in zip(self.offsets[slot], self.sizes[slot]):
+                shots.append(self.data[offset:offset + 4 * rangeX * rangeY].reshape(4, rangeX, rangeY))
+            self.cache[key] = shots
+        return self.cache[key]
@@ -0,0 +1,105 @@
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+
+# Isolated execution for the runner: every worker is its own process fed one mesh at a time over a pipe,
+# and the driver watches it. A worker that takes longer than the timeout on one mesh, grows over the memory cap
+# (resident set, read from /proc on Linux) or dies (e.g. a segfault in V-HACD) is killed and replaced, and only
+# that mesh is reported as failed. The replacement runs initWorker again, the other workers are not touched.
+
+def _workerLoop(conn, stageName, cached, profiled):
+    from .runner import _initWorker, _runItem
+    _initWorker(stageName, cached, profiled)
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        conn.send(_runItem(task))
+
+def residentBytes(pid):
+    try:
+        with open('/proc/{}/status'.format(pid)) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+class IsolatedWorker(object):
+    def __init__(self, context, stageName, cached, profiled):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_workerLoop, args=(child, stageName, cached, profiled), daemon=True)
+        self.process.start()
+        child.close()
+        self.task = None
+        self.started = None
+
+    def submit(self, index, task):
+        self.task = (index, task)
+        self.started = time.time()
+        self.conn.send(task)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+
+def _failure(item, elapsed, reason):
+    return item, elapsed, None, None, None, {'reason': reason, 'peakRss': None, 'faces': None}
+
+def runIsolated(stageName, tasks, workers, context = 'spawn', cached = False, profiled = False,
+                timeout = None, memoryLimit = None, pollSeconds = 0.5):
+    # tasks: (index, (item, record)) pairs. Yields (index, what _runItem returns) in completion order.
+    context = multiprocessing.get_context(context)
+    pending = list(tasks)[::-1]
+    pool = [IsolatedWorker(context, stageName, cached, profiled) for _ in range(min(workers, len(pending)))]
+    try:
+        while pending or any(worker.task is not None for worker in pool):
+            for worker in pool:
+                if worker.task is None and pending:
+                    worker.submit(*pending.pop())
+
+            busy = [worker for worker in pool if worker.task is not None]
+            ready = wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy], pollSeconds)
+            now = time.time()
+            for slot, worker in enumerate(pool):
+                if worker.task is None:
+                    continue
+                index, (item, _) = worker.task
+                reason = None
+                if worker.conn in ready:
+                    try:
+                        result = worker.conn.recv()
+                        worker.task = None
+                        yield index, result
+                        continue
+                    except (EOFError, OSError):
+                        reason = 'worker died (exit code {})'.format(worker.process.exitcode)
+                elif worker.process.sentinel in ready:
+                    worker.process.join()
+                    reason = 'worker died (exit code {})'.format(worker.process.exitcode)
+                elif timeout is not None and now - worker.started > timeout:
+                    reason = 'timeout after {:.0f}s'.format(timeout)
+                elif memoryLimit is not None and (residentBytes(worker.process.pid) or 0) > memoryLimit:
+                    reason = 'memory limit of {:.0f} MB exceeded'.format(memoryLimit / 2 ** 20)
+                if reason is None:
+                    continue
+                worker.kill()
+                pool[slot] = IsolatedWorker(context, stageName, cached, profiled)
+                yield index, _failure(item, now - worker.started, reason)
+    finally:
+        for worker in pool:
+            if worker.task is None:
+                worker.stop()
+            else:
+                worker.kill()
@@ -0,0 +1,208 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Fast OBJ / OFF readers that go straight from the file bytes to NumPy arrays.
+# The lines are never split into Python objects: the records of one kind are gathered with
+# byte masks and parsed in one np.fromstring call, OFF records are located by the token count of every line.
+# Polygons are fan triangulated. A file is read whole with one np.fromfile rather than in chunks: the masks need the
+# line structure of the entire file, chunks would split records at their borders, and the meshes of the catalog
+# are a few MB at most.
+# The writers format a whole array with one printf, convertTree converts a directory tree over a process pool.
+
+meshExtensions = ('.obj', '.off')
+
+_space, _tab, _newline, _return, _slash = [ord(c) for c in ' \t\n\r/']
+
+def _isSpace(buf):
+    return (buf == _space) | (buf == _tab) | (buf == _newline) | (buf == _return)
+
+def _lines(buf):
+    ends = np.flatnonzero(buf == _newline)
+    if len(buf) > 0 and buf[-1] != _newline:
+        ends = np.append(ends, len(buf))
+    starts = np.concatenate([[0], ends[:-1] + 1]).astype(np.int64)
+    return starts, ends
+
+def _gather(buf, starts, ends, selected, skip):
+    # Concatenate the selected lines (with their line break) and blank their first `skip` bytes.
+    # Records of one kind come in a few long runs of lines, so whole runs are sliced at once.
+    lines = np.flatnonzero(selected)
+    if len(lines) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    breaks = np.flatnonzero(np.diff(lines) != 1)
+    runFirst = lines[np.concatenate([[0], breaks + 1])]
+    runLast = lines[np.concatenate([breaks, [len(lines) - 1]])]
+    pieces = [buf[starts[a]:ends[b] + 1] for a, b in zip(runFirst, runLast)]
+    block = np.concatenate(pieces)
+
+    pieceOffsets = np.concatenate([[0], np.cumsum([len(piece) for piece in pieces])[:-1]])
+    runIds = np.searchsorted(runFirst, lines, side='right') - 1
+    positions = starts[lines] - starts[runFirst][runIds] + pieceOffsets[runIds]
+    for k in range(skip):
+        block[positions + k] = _space
+    return block
+
+def _parse(block):
+    if len(block) == 0:
+        return np.zeros(0)
+    return np.fromstring(block.tobytes().decode('ascii', 'ignore'), sep=' ')
+
+def _tokenCounts(block, numLines):
+    # Number of whitespace separated tokens on every gathered line.
+    breaks = block == _newline
+    lineIds = np.cumsum(breaks) - breaks
+    space = _isSpace(block)
+    tokenStart = ~space & np.concatenate([[True], space[:-1]])
+    return np.bincount(lineIds[tokenStart], minlength=numLines)
+
+def fanTriangulate(polygons, counts):
+    # Polygons given as one flat index array plus the vertex count of every polygon.
+    if np.all(counts == 3):
+        return polygons.reshape(-1, 3)
+    first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    triangles = np.maximum(counts - 2, 0)
+    base = np.repeat(first, triangles)
+    step = np.arange(triangles.sum()) - np.repeat(np.cumsum(triangles) - triangles, triangles)
+    return np.stack([polygons[base], polygons[base + step + 1], polygons[base + step + 2]], axis=1)
+
+def parseObj(buf):
+    starts, ends = _lines(buf)
+    if len(starts) == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+    first = buf[np.minimum(starts, len(buf) - 1)]
+    second = buf[np.minimum(starts + 1, len(buf) - 1)]
+    vertexLines = (first == ord('v')) & ((second == _space) | (second == _tab))
+    faceLines = (first == ord('f')) & ((second == _space) | (second == _tab))
+
+    numVertices = int(vertexLines.sum())
+    block = _gather(buf, starts, ends, vertexLines, 2)
+    values = _parse(block)
+    if numVertices == 0:
+        vertices = np.zeros((0, 3))
+    elif len(values) == numVertices * 3:
+        vertices = values.reshape(-1, 3)
+    else:
+        # Some vertex records carry colors after the position.
+        first = np.concatenate([[0], np.cumsum(_tokenCounts(block, numVertices))[:-1]])
+        vertices = values[first[:, None] + np.arange(3)]
+
+    numFaces = int(faceLines.sum())
+    block = _gather(buf, starts, ends, faceLines, 2)
+    if np.any(block == _slash):
+        # Drop the texture / normal references: everything from a '/' to the end of its token.
+        index = np.arange(len(block))
+        lastSpace = np.maximum.accumulate(np.where(_isSpace(block), index, -1))
+        lastSlash = np.maximum.accumulate(np.where(block == _slash, index, -1))
+        block[lastSlash > lastSpace] = _space
+
+    polygons = _parse(block).astype(np.int64)
+    # Every face has at least three indices, so this many values means triangles only.
+    if len(polygons) == numFaces * 3:
+        counts = np.full(numFaces, 3)
+    else:
+        counts = _tokenCounts(block, numFaces)
+    # Negative indices count back from the vertices defined so far.
+    verticesBefore = np.repeat(np.cumsum(vertexLines)[faceLines], counts)
+    polygons = np.where(polygons < 0, verticesBefore + polygons, polygons - 1)
+    return vertices, fanTriangulate(polygons, counts)
+
+def parseOff(buf):
+    buf = buf.copy()
+    starts, ends = _lines(buf)
+    # Comments run from a '#' to the end of its line.
+    hashes = np.flatnonzero(buf == ord('#'))
+    if len(hashes) > 0:
+        breaks = buf == _newline
+        lineIds = np.cumsum(breaks) - breaks
+        commentStart = np.full(len(starts), len(buf))
+        np.minimum.at(commentStart, lineIds[hashes], hashes)
+        buf[(np.arange(len(buf)) >= commentStart[lineIds]) & (buf != _newline)] = _space
+    text = np.flatnonzero(~_isSpace(buf))
+    assert len(text) > 0 and buf[text[0]:text[0] + 3].tobytes() == b'OFF', 'not an OFF file'
+    buf[text[0]:text[0] + 3] = _space
+    values = _parse(buf)
+    numVertices, numFaces = int(values[0]), int(values[1])
+
+    vertices = values[3:3 + numVertices * 3].reshape(-1, 3)
+    records = values[3 + numVertices * 3:]
+    if len(records) == numFaces * 4 and np.all(records[0::4] == 3):
+        return vertices, records.reshape(-1, 4)[:, 1:4].astype(np.int64)
+
+    # Colors or mixed polygon sizes: index the values by line, the counts line, then one line per vertex and face.
+    counts = _tokenCounts(buf, len(starts))
+    offsets = (np.cumsum(counts) - counts)[counts > 0]
+    vertexOffsets = offsets[1:1 + numVertices]
+    faceOffsets = offsets[1 + numVertices:1 + numVertices + numFaces]
+    vertices = values[vertexOffsets[:, None] + np.arange(3)]
+    # The vertex count leads every face, colors after the indices are skipped.
+    polygonSizes = values[faceOffsets].astype(np.int64)
+    step = np.arange(polygonSizes.sum()) - np.repeat(np.cumsum(polygonSizes) - polygonSizes, polygonSizes)
+    polygons = values[np.repeat(faceOffsets + 1, polygonSizes) + step].astype(np.int64)
+    return vertices, fanTriangulate(polygons, polygonSizes)
+
+def readMesh(path):
+    buf = np.fromfile(path, dtype=np.uint8)
+    if path.lower().endswith('.off'):
+        return parseOff(buf)
+    return parseObj(buf)
+
+def mergeVertices(vertices, faces, digits = 8):
+    # Weld vertices sharing a position, like trimesh does on load.
+    # The merged vertices keep the order in which they first appear.
+    _, first, inverse = np.unique(np.round(vertices, digits), axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return vertices[first[order]], rank[inverse.reshape(-1)][faces]
+
+def formatRows(array, fmt, prefix = ''):
+    # One printf over the whole array instead of one call per row.
+    if len(array) == 0:
+        return ''
+    row = prefix + ' '.join([fmt] * array.shape[1]) + '\n'
+    return (row * len(array)) % tuple(array.ravel().tolist())
+
+def writeOff(path, vertices, faces):
+    with open(path, 'w') as f:
+        f.write('OFF\n{} {} 0\n'.format(len(vertices), len(faces)))
+        f.write(formatRows(vertices, '%.8f'))
+        f.write(formatRows(np.asarray(faces), '%d', '3 '))
+
+def writeObj(path, vertices, faces):
+    with open(path, 'w') as f:
+        f.write(formatRows(vertices, '%.8f', 'v '))
+        f.write(formatRows(np.asarray(faces) + 1, '%d', 'f '))
+
+def writeMesh(path, vertices, faces):
+    if path.lower().endswith('.off'):
+        writeOff(path, vertices, faces)
+    else:
+        writeObj(path, vertices, faces)
+
+def convertFile(sourcePath, targetPath, merge = True):
+    vertices, faces = readMesh(sourcePath)
+    if merge:
+        vertices, faces = mergeVertices(vertices, faces)
+    writeMesh(targetPath, vertices, faces)
+    return targetPath
+
+def _convertPair(pair):
+    return convertFile(*pair)
+
+def treePairs(source, target, extension):
+    # (source file, target file) for every mesh below source, the folder structure is mirrored under target.
+    pairs = []
+    for folder, _, files in os.walk(source):
+        for name in sorted(files):
+            if name.lower().endswith(meshExtensions):
+                relative = os.path.relpath(os.path.join(folder, name), source)
+                pairs.append((os.path.join(source, relative), os.path.join(target, os.path.splitext(relative)[0] + extension)))
+    return pairs
+
+def convertTree(source, target, extension = '.off', workers = None, chunksize = 16):
+    pairs = treePairs(source, target, extension)
+    for folder in sorted(set(os.path.dirname(targetPath) for _, targetPath in pairs)):
+        os.makedirs(folder, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_convertPair, pairs, chunksize=chunksize))
@@ -0,0 +1,52 @@
+import numpy as np
+
+# Occupancy grids for comparing posed meshes.
+# Instead of one contains() ray per grid point, every grid column (x, y) is cut by the triangles
+# once: the z values where the column crosses the surface give the inside intervals along z.
+# Grids are stored as packed bitsets and compared by the popcount of their XOR.
+
+_popcount = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+def gridAxes(extents, interVal):
+    return [np.linspace(0, extents[d], interVal) for d in range(3)]
+
+def columnCrossings(triangles, columns, chunk = 256):
+    # All (column index, z) pairs where a vertical line through a column pierces a triangle.
+    hitColumns, hitZ = [], []
+    qx, qy = columns[:, 0][None, :], columns[:, 1][None, :]
+    for start in range(0, len(triangles), chunk):
+        tri = triangles[start:start + chunk]
+        a, b, c = tri[:, 0], tri[:, 1], tri[:, 2]
+        area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+        keep = np.abs(area) > 1e-16 # triangles standing vertically never cross a column
+        a, b, c, area = a[keep], b[keep], c[keep], area[keep][:, None]
+
+        u = ((b[:, 0:1] - qx) * (c[:, 1:2] - qy) - (b[:, 1:2] - qy) * (c[:, 0:1] - qx)) / area
+        v = ((c[:, 0:1] - qx) * (a[:, 1:2] - qy) - (c[:, 1:2] - qy) * (a[:, 0:1] - qx)) / area
+        w = 1 - u - v
+        triIdx, colIdx = np.nonzero((u >= 0) & (v >= 0) & (w >= 0))
+        z = u[triIdx, colIdx] * a[triIdx, 2] + v[triIdx, colIdx] * b[triIdx, 2] + w[triIdx, colIdx] * c[triIdx, 2]
+        hitColumns.append(colIdx)
+        hitZ.append(z)
+    return np.concatenate(hitColumns), np.concatenate(hitZ)
+
+def voxelize(mesh, extents, interVal):
+    # Same grid and (x, y, z) ordering as testing mesh.contains on the linspace points over extents.
+    xRange, yRange, zRange = gridAxes(extents, interVal)
+    # Nudge the columns off the grid lines so they never run exactly through a shared edge or vertex.
+    jitter = np.array([np.sqrt(2), np.sqrt(3)]) * 1e-7 * max(np.max(extents), 1e-9)
+    columns = np.stack(np.meshgrid(xRange, yRange, indexing='ij'), axis=-1).reshape(-1, 2) + jitter
+
+    hitColumns, hitZ = columnCrossings(np.asarray(mesh.triangles), columns)
+    # A grid point is inside when an odd number of crossings lies below it.
+    crossings = np.zeros((len(columns), interVal + 1), dtype=np.int32)
+    np.add.at(crossings, (hitColumns, np.searchsorted(zRange, hitZ, side='right')), 1)
+    inside = np.cumsum(crossings, axis=1)[:, 0:interVal] % 2 == 1
+    return np.packbits(inside.reshape(-1))
+
+def occupiedCount(packed):
+    return _popcount[packed].sum(axis=-1)
+
+def pairwiseXorCount(packedList):
+    packed = np.stack(packedList)
+    return _popcount[packed[:, None, :] ^ packed[None, :, :]].sum(axis=-1)
@@ -0,0 +1,87 @@
+import os
+import numpy as np
+
+# One memory mapped point cloud array for the whole catalog.
+#   points.bin  raw (N_total, 3) float32 or float16 samples of every mesh back to back
+#   index.npz   names, offsets and counts (in points) of every mesh, plus the dtype
+# Meshes get a fixed slot when the store is laid out, so pool workers can fill their slots in place,
+# and new meshes are appended at the end without touching the existing ones. A mesh whose slot holds
+# a different count (pointcloud_size changed) gets a new slot at the end, the old one is left unused.
+
+def _paths(storeDir):
+    return os.path.join(storeDir, 'points.bin'), os.path.join(storeDir, 'index.npz')
+
+def loadIndex(storeDir):
+    _, indexPath = _paths(storeDir)
+    if not os.path.exists(indexPath):
+        return None
+    index = np.load(indexPath)
+    names = [str(name) for name in index['names']]
+    return {'names': names, 'offsets': index['offsets'], 'counts': index['counts'],
+            'dtype': str(index['dtype']), 'slots': {name: slot for slot, name in enumerate(names)}}
+
+def layoutStore(storeDir, names, count, dtype = 'float32'):
+    # Reserve count points for every name that has no slot of that size yet.
+    os.makedirs(storeDir, exist_ok=True)
+    pointsPath, indexPath = _paths(storeDir)
+    index = loadIndex(storeDir)
+    if index is None or index['dtype'] != dtype or not os.path.exists(pointsPath):
+        index = {'names': [], 'offsets': np.zeros(0, dtype=np.int64), 'counts': np.zeros(0, dtype=np.int64), 'dtype': dtype, 'slots': {}}
+        open(pointsPath, 'wb').close()
+
+    newNames = [name for name in names if name not in index['slots'] or index['counts'][index['slots'][name]] != count]
+    moved = set(newNames)
+    keep = [slot for slot, name in enumerate(index['names']) if name not in moved]
+    end = int(np.max(index['offsets'] + index['counts'])) if len(index['names']) else 0
+    offsets = np.concatenate([index['offsets'][keep], end + count * np.arange(len(newNames), dtype=np.int64)])
+    counts = np.concatenate([index['counts'][keep], np.full(len(newNames), count, dtype=np.int64)])
+    names = [index['names'][slot] for slot in keep] + newNames
+
+    total = int(np.max(offsets + counts)) if len(names) else 0
+    with open(pointsPath, 'r+b') as f:
+        f.truncate(total * 3 * np.dtype(dtype).itemsize)
+    np.savez(indexPath + '.tmp.npz', names=np.array(names), offsets=offsets, counts=counts, dtype=dtype)
+    os.replace(indexPath + '.tmp.npz', indexPath)
+    return loadIndex(storeDir)
+
+def writePoints(storeDir, index, name, points):
+    pointsPath, _ = _paths(storeDir)
+    slot = index['slots'][name]
+    dtype = np.dtype(index['dtype'])
+    count = int(index['counts'][slot])
+    assert len(points) == count
+    target = np.memmap(pointsPath, dtype=dtype, mode='r+',
+                       offset=int(index['offsets'][slot]) * 3 * dtype.itemsize, shape=(count, 3))
+    target[:] = points.astype(dtype)
+    target.flush()
+    del target
+
+def isFilled(storeDir, name, count):
+    # The slot of name exists with count points and was written, a laid out but unwritten slot (or a
+    # truncated points.bin) reads back as zeros or is too short.
+    pointsPath, _ = _paths(storeDir)
+    index = loadIndex(storeDir)
+    if index is None or name not in index['slots'] or not os.path.exists(pointsPath):
+        return False
+    slot = index['slots'][name]
+    dtype = np.dtype(index['dtype'])
+    offset = int(index['offsets'][slot])
+    if int(index['counts'][slot]) != count or os.path.getsize(pointsPath) < (offset + count) * 3 * dtype.itemsize:
+        return False
+    points = np.memmap(pointsPath, dtype=dtype, mode='r', offset=offset * 3 * dtype.itemsize, shape=(count, 3))
+    return not np.any(np.all(points == 0, axis=1))
+
+def openStore(storeDir):
+    # Zero-copy view of the whole catalog, slice it with getPoints.
+    pointsPath, _ = _paths(storeDir)
+    index = loadIndex(storeDir)
+    total = int(np.max(index['offsets'] + index['counts'])) if len(index['names']) else 0
+    points = np.memmap(pointsPath, dtype=index['dtype'], mode='r', shape=(total, 3))
+    return points, index
+
+def getPoints(store, name, count = None):
+    points, index = store
+    slot = index['slots'][name]
+    offset = int(index['offsets'][slot])
+    count = int(index['counts'][slot]) if count is None else min(count, int(index['counts'][slot]))
+    return points[offset:offset + count]
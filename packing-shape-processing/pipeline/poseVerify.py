@@ -0,0 +1,71 @@
+import math
+import numpy as np
+import pybullet as p
+import pyquaternion
+import transforms3d
+
+# Settle many candidate stable poses in one PyBullet world.
+# Every candidate gets its own cell on a ground plane next to the container,
+# all of them are stepped by a single loop, and the drift of each body is reported.
+
+def poseQuat(T):
+    quat = transforms3d.quaternions.mat2quat(T[0:3, 0:3])
+    return [quat[1], quat[2], quat[3], quat[0]]  # Saved in xyzw
+
+def addGround(interface):
+    # The container floor only covers the bin, the cells need a floor of their own.
+    # It is kept on the interface, whose reset() removes it along with the other bodies.
+    if interface.groundId is None:
+        planeShape = p.createCollisionShape(shapeType=p.GEOM_PLANE)
+        interface.groundId = p.createMultiBody(baseMass=0, baseCollisionShapeIndex=planeShape)
+    return interface.groundId
+
+def cellOrigins(interface, number, cellSize):
+    # Start one cell beyond the right wall of the container (walls are one unit thick).
+    columns = int(math.ceil(math.sqrt(number)))
+    startX = interface.bin[0] + 1 + cellSize
+    return [[startX + (idx % columns) * cellSize, (idx // columns) * cellSize, 0] for idx in range(number)]
+
+def poseDrift(before, after):
+    _, orienBefore, positionBefore = before
+    _, orienAfter, positionAfter = after
+    q1 = pyquaternion.Quaternion([orienBefore[3], *orienBefore[0:3]])  # wxyz
+    q2 = pyquaternion.Quaternion([orienAfter[3], *orienAfter[0:3]])
+    r_diff = pyquaternion.Quaternion.absolute_distance(q1, q2)
+    t_diff = np.linalg.norm(np.array(positionBefore) - np.array(positionAfter))
+    return r_diff, t_diff
+
+def settleBatch(interface, candidates, linearTol = 0.01, angularTol = 0.01, batch = 1.0, dt = 0.01, maxBatch = 10,
+                cellSize = None, linearDamping = 0.5, angularDamping = 0.5):
+    # candidates: list of (shape name, 4x4 pose). Returns (r_diff, t_diff) per candidate.
+    if len(candidates) == 0:
+        return []
+    addGround(interface)
+
+    ids = []
+    for name, T in candidates:
+        id = interface.addObject(name, targetFLB=[0, 0, 0], rotation=poseQuat(T),
+                                 linearDamping=linearDamping, angularDamping=angularDamping)
+        ids.append(id)
+    if cellSize is None:
+        # Twice the largest body diagonal keeps tipping bodies out of their neighbours' cells.
+        cellSize = 2 * max(np.linalg.norm(interface.meshDict[id].extents) for id in ids)
+    for id, origin in zip(ids, cellOrigins(interface, len(ids), cellSize)):
+        interface.reset_Wraped_Position_And_Orientation(id, origin)
+
+    before = [interface.get_Wraped_Position_And_Orientation(id, getPosBase=True) for id in ids]
+
+    linearTolSqr = linearTol * linearTol
+    angularTolSqr = angularTol * angularTol
+    for _ in range(maxBatch):
+        for i in range(int(batch/dt)):
+            p.stepSimulation()
+        velocities = np.array([p.getBaseVelocity(id) for id in ids])
+        if np.all(np.sum(velocities[:, 0] ** 2, axis=1) <= linearTolSqr) and \
+           np.all(np.sum(velocities[:, 1] ** 2, axis=1) <= angularTolSqr):
+            break
+
+    after = [interface.get_Wraped_Position_And_Orientation(id, getPosBase=True) for id in ids]
+    for id in ids:
+        interface.removeBody(id)
+    return [poseDrift(b, a) for b, a in zip(before, after)]
@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import resource
+import numpy as np
+
+# Per mesh measurements of the stages run by the runner, one JSON line per mesh in <profileDir>/<stage>.jsonl:
+#   {'stage', 'item', 'status': ok | cached | failed, 'seconds', 'peakRss' (bytes), 'faces', 'reason', 'time'}
+# Peak RSS is the high water mark of the worker while it handled the mesh; it is reset before every mesh where the
+# kernel allows it (/proc/self/clear_refs), otherwise it is the peak of the worker so far.
+# summarize() turns the logs into the slowest meshes and a per stage table:
+#   python -m pipeline.profiling ./build_profile
+
+def resetPeakRss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peakRss():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+def faceCount(path):
+    # Counted on the raw bytes, the mesh is not parsed.
+    if not os.path.exists(path):
+        return None
+    lower = path.lower()
+    if lower.endswith('.obj'):
+        with open(path, 'rb') as f:
+            data = f.read()
+        return data.count(b'\nf ') + data.count(b'\nf\t') + int(data.startswith(b'f '))
+    if lower.endswith('.off'):
+        with open(path, 'rb') as f:
+            for line in f:
+                fields = line.split(b'#')[0].split()
+                if len(fields) == 0 or fields == [b'OFF']:
+                    continue
+                if fields[0] == b'OFF':
+                    fields = fields[1:]
+                return int(fields[1])
+    return None
+
+def itemFaces(stage, item):
+    # Stages can report their own face count with itemFaces(item), else the first mesh input is counted.
+    if hasattr(stage, 'itemFaces'):
+        return stage.itemFaces(item)
+    if hasattr(stage, 'itemInputs'):
+        inputs = stage.itemInputs(item)
+        if len(inputs) > 0:
+            return faceCount(inputs[0])
+    return None
+
+class ProfileLog:
+
+    def __init__(self, stageName, profileDir):
+        os.makedirs(profileDir, exist_ok=True)
+        self.stageName = stageName
+        self.path = os.path.join(profileDir, stageName + '.jsonl')
+        self.file = open(self.path, 'a')
+
+    def record(self, item, status, seconds = None, peakRss = None, faces = None, reason = None):
+        entry = {'stage': self.stageName, 'item': item, 'status': status, 'seconds': seconds,
+                 'peakRss': peakRss, 'faces': faces, 'reason': reason, 'time': time.time()}
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def loadLogs(profileDir):
+    entries = []
+    for name in sorted(os.listdir(profileDir)):
+        if name.endswith('.jsonl'):
+            with open(os.path.join(profileDir, name)) as f:
+                entries += [json.loads(line) for line in f if line.strip()]
+    return entries
+
+def latestEntries(entries, timed = False):
+    # A mesh run several times only counts with its last run, or with its last run that was not skipped.
+    latest = {}
+    for entry in entries:
+        if not timed or (entry['status'] != 'cached' and entry['seconds'] is not None):
+            latest[(entry['stage'], entry['item'])] = entry
+    return list(latest.values())
+
+def summarize(profileDir, top = 20):
+    logs = loadLogs(profileDir)
+    entries = latestEntries(logs)
+    processed = latestEntries(logs, timed=True)
+
+    print('slowest meshes')
+    print('{:<25} {:<40} {:>10} {:>10} {:>10}'.format('stage', 'item', 'seconds', 'peak MB', 'faces'))
+    for e in sorted(processed, key=lambda e: e['seconds'], reverse=True)[0:top]:
+        print('{:<25} {:<40} {:>10.2f} {:>10.1f} {:>10}'.format(e['stage'], str(e['item'])[0:40], e['seconds'],
+              (e['peakRss'] or 0) / 2 ** 20, e['faces'] if e['faces'] is not None else '-'))
+
+    print('stages')
+    print('{:<25} {:>7} {:>7} {:>7} {:>10} {:>8} {:>8} {:>8} {:>9}'.format(
+        'stage', 'meshes', 'cached', 'failed', 'total s', 'mean s', 'p95 s', 'max s', 'peak MB'))
+    stages, timedStages = {}, {}
+    for e in entries:
+        stages.setdefault(e['stage'], []).append(e)
+    for e in processed:
+        timedStages.setdefault(e['stage'], []).append(e)
+    rows = []
+    for stageName, stageEntries in stages.items():
+        seconds = np.array([e['seconds'] for e in timedStages.get(stageName, [])])
+        peaks = [e['peakRss'] for e in timedStages.get(stageName, []) if e['peakRss'] is not None]
+        rows.append((stageName, len(stageEntries),
+                     sum(e['status'] == 'cached' for e in stageEntries),
+                     sum(e['status'] == 'failed' for e in stageEntries),
+                     seconds.sum(), seconds.mean() if len(seconds) else 0.0,
+                     np.percentile(seconds, 95) if len(seconds) else 0.0,
+                     seconds.max() if len(seconds) else 0.0, max(peaks) / 2 ** 20 if peaks else 0.0))
+    for row in sorted(rows, key=lambda row: row[4], reverse=True):
+        print('{:<25} {:>7} {:>7} {:>7} {:>10.1f} {:>8.2f} {:>8.2f} {:>8.2f} {:>9.1f}'.format(*row))
+
+    failures = [e for e in entries if e['status'] == 'failed']
+    if failures:
+        print('failures')
+        for e in failures:
+            print('{:<25} {:<40} {}'.format(e['stage'], str(e['item'])[0:40], e['reason']))
+    return entries
+
+if __name__ == '__main__':
+    summarize(sys.argv[1] if len(sys.argv) > 1 else './build_profile')
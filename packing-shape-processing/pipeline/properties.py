@@ -0,0 +1,59 @@
+import os
+import numpy as np
+from .heightmaps import shapeName, zRotations
+
+# Geometric properties of every shape, computed once and kept in one structured array (.npy):
+#   name        shape name, the file name without extension
+#   volume      mesh volume, the mass Interface gives a body (density 1)
+#   extents     (ZRotNum, 3) axis aligned extents in every Z rotation
+#   hullVolume  convex hull volume
+#   centerMass  center of mass in the frame of the file
+#   inertia     inertia tensor about the center of mass (density 1)
+
+nameLength = 128
+
+def propertyDtype(ZRotNum):
+    return np.dtype([('name', 'U{}'.format(nameLength)), ('volume', 'f8'), ('extents', 'f8', (ZRotNum, 3)),
+                     ('hullVolume', 'f8'), ('centerMass', 'f8', (3,)), ('inertia', 'f8', (3, 3))])
+
+def shapeProperties(name, mesh, ZRotNum):
+    row = np.zeros(1, dtype=propertyDtype(ZRotNum))
+    hull = mesh.convex_hull
+    row['name'] = name
+    row['volume'] = mesh.volume
+    # The extents of a rotated mesh are those of its rotated hull.
+    for rotIdx, rotation in enumerate(zRotations(ZRotNum)):
+        rotated = hull.vertices @ rotation[0:3, 0:3].T
+        row['extents'][0, rotIdx] = rotated.max(axis=0) - rotated.min(axis=0)
+    row['hullVolume'] = hull.volume
+    row['centerMass'] = mesh.center_mass
+    row['inertia'] = mesh.moment_inertia
+    return row
+
+def writeTable(path, rows):
+    table = np.concatenate(rows) if len(rows) > 0 else np.zeros(0, dtype=propertyDtype(1))
+    np.save(path + '.tmp.npy', table)
+    os.replace(path + '.tmp.npy', path)
+
+class PropertyTable:
+    # Rows by shape name or, given id2shape (dicPath), by item id. The table is memory mapped.
+
+    def __init__(self, path, id2shape = None):
+        self.table = np.load(path, mmap_mode='r')
+        self.id2shape = id2shape
+        self.slots = {str(name): slot for slot, name in enumerate(self.table['name'])}
+
+    def shapeName(self, key):
+        return shapeName(key, self.id2shape)
+
+    def __contains__(self, key):
+        return self.shapeName(key) in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __getitem__(self, key):
+        return self.table[self.slots[self.shapeName(key)]]
+
+    def volume(self, key):
+        return float(self[key]['volume'])
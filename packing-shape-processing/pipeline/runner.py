@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .buildCache import BuildCache, isCacheable, isFresh, itemKey, removeOutputs
+from .profiling import ProfileLog, itemFaces, peakRss, resetPeakRss, summarize
+from .checkpoint import Checkpoint
+from .isolation import runIsolated
+
+# Fan the numbered stages out over a process pool, one mesh per task.
+# A stage is any numbered script exposing
+#   listItems()        -> the catalog entries to process (file names)
+#   processItem(item)  -> handle a single mesh
+# and optionally
+#   prepare()          -> called once in the driver before the pool starts
+#   initWorker()       -> called once in every worker, e.g. to open a PyBullet DIRECT connection
+#   finish(items, results) -> called once in the driver with what processItem returned, in catalog order
+#   itemInputs(item)   -> files the result of one mesh depends on
+#   itemOutputs(item)  -> files one mesh produced
+#   itemValid(item)    -> False when a result the build cache cannot see (e.g. a slot of a shared file) is missing
+#   stageParams        -> dict of parameters that change the outputs
+#   itemFaces(item)    -> face count reported to the profile log, defaults to the faces of the first input
+# Stages providing itemInputs/itemOutputs are skipped per mesh by the build cache when nothing changed.
+# A mesh raising an exception is reported as failed and the stage goes on with the next one.
+# With isolate=True every worker is watched by the driver (timeout, memory cap, crashes, see isolation.py),
+# and with a checkpointDir finished meshes are checkpointed and failed ones quarantined, so a run resumes
+# where it was interrupted and does not retry quarantined meshes (unless retryQuarantined).
+
+stageRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+meshStages = ['1_1_sort_files',
+              '1_2_check_water_tight',
+              '2_1_water_tight',
+              '2_2_remove_bad',
+              '3_1_meshdownsample',
+              '3_2_stable_poses',
+              '3_3_min_area',
+              '3_4_vhacd',
+              '3_5_mesh_with_poses',
+              '3_6_vhacd_with_poses',
+              '3_10_shot_info',
+              '3_11_shape_properties',
+              '3_7_pointcloud']
+
+_stage = None
+_cached = False
+_profiled = False
+
+def loadStage(stageName):
+    if stageRoot not in sys.path:
+        sys.path.insert(0, stageRoot)
+    # The stage scripts start with a digit, so they can only be imported by name.
+    return importlib.import_module(stageName)
+
+def _initWorker(stageName, cached, profiled = False):
+    global _stage, _cached, _profiled
+    _stage = loadStage(stageName)
+    _cached = cached
+    _profiled = profiled
+    if hasattr(_stage, 'initWorker'):
+        _stage.initWorker()
+
+def _runItem(task):
+    item, record = task
+    key, outputs = None, None
+    profile = {}
+    resetPeakRss()
+    s = time.time()
+    # Everything touching the item runs under the same guard, a name a stage cannot parse only fails that mesh.
+    try:
+        if _cached:
+            # Hashing happens in the workers so the driver never reads the catalog itself.
+            key = itemKey(_stage.itemInputs(item), getattr(_stage, 'stageParams', {}))
+            if isFresh(record, key) and (not hasattr(_stage, 'itemValid') or _stage.itemValid(item)):
+                return item, None, key, record['outputs'], None, None
+            removeOutputs(record)
+
+        # Counted before processing, some stages remove their input.
+        if _profiled:
+            profile['faces'] = itemFaces(_stage, item)
+        s = time.time()
+        result = _stage.processItem(item)
+        elapsed = time.time() - s
+        if _cached:
+            outputs = [path for path in _stage.itemOutputs(item) if os.path.exists(path)]
+        profile['reason'] = None
+    except Exception as e:
+        result, outputs = None, None
+        elapsed = time.time() - s
+        profile['reason'] = '{}: {}'.format(type(e).__name__, e)
+    profile['peakRss'] = peakRss()
+    return item, elapsed, key, outputs, result, profile
+
+def _poolResults(stageName, tasks, workers, chunksize, context, cached, profiled):
+    # spawn keeps the workers free of any PyBullet client the driver might hold.
+    with ProcessPoolExecutor(max_workers = workers,
+                             mp_context = multiprocessing.get_context(context),
+                             initializer = _initWorker,
+                             initargs = (stageName, cached, profiled)) as executor:
+        # map yields in submission order, so progress is reported in catalog order.
+        indices = [index for index, _ in tasks]
+        for index, result in zip(indices, executor.map(_runItem, [task for _, task in tasks], chunksize = chunksize)):
+            yield index, result
+
+def runStage(stageName, items = None, workers = None, chunksize = 1, context = 'spawn', cacheDir = None, profileDir = None,
+             isolate = False, timeout = None, memoryLimit = None, checkpointDir = None, retryQuarantined = False):
+    stage = loadStage(stageName)
+    if hasattr(stage, 'prepare'):
+        stage.prepare()
+    if items is None:
+        items = stage.listItems()
+    workers = workers if workers is not None else os.cpu_count()
+
+    cache = BuildCache(stageName, cacheDir) if cacheDir is not None and isCacheable(stage) else None
+    log = ProfileLog(stageName, profileDir) if profileDir is not None else None
+    checkpoint = Checkpoint(stageName, checkpointDir) if checkpointDir is not None else None
+    if checkpoint is not None and retryQuarantined:
+        checkpoint.release(items)
+
+    total = len(items)
+    results = [None] * total
+    resumed, quarantined = 0, 0
+    tasks = []
+    for index, item in enumerate(items):
+        if checkpoint is not None and item in checkpoint.done:
+            results[index] = checkpoint.done[item]
+            resumed += 1
+        elif checkpoint is not None and item in checkpoint.quarantined:
+            quarantined += 1
+            print('[{}] {} quarantined: {}'.format(stageName, item, checkpoint.quarantined[item]))
+        else:
+            tasks.append((index, (item, cache.lookup(item) if cache is not None else None)))
+    if resumed > 0:
+        print('[{}] resuming, {} meshes already done'.format(stageName, resumed))
+
+    skipped = 0
+    failed = 0
+    start = time.time()
+    if isolate:
+        stream = runIsolated(stageName, tasks, workers, context, cache is not None, log is not None, timeout, memoryLimit)
+    else:
+        stream = _poolResults(stageName, tasks, workers, chunksize, context, cache is not None, log is not None)
+    try:
+        for counter, (index, (item, elapsed, key, outputs, result, profile)) in enumerate(stream):
+            results[index] = result
+            progress = resumed + quarantined + counter + 1
+            if elapsed is None:
+                skipped += 1
+                print('[{}] {}/{} {} (cached)'.format(stageName, progress, total, item))
+                if log is not None:
+                    log.record(item, 'cached')
+                if checkpoint is not None:
+                    checkpoint.markDone(item, result)
+                continue
+            if log is not None:
+                log.record(item, 'failed' if profile['reason'] else 'ok', elapsed, profile['peakRss'], profile.get('faces'), profile['reason'])
+            if profile['reason'] is not None:
+                failed += 1
+                print('[{}] {}/{} {} failed: {}'.format(stageName, progress, total, item, profile['reason']))
+                if checkpoint is not None:
+                    checkpoint.quarantine(item, profile['reason'])
+                continue
+            print('[{}] {}/{} {} ({:.2f}s)'.format(stageName, progress, total, item, elapsed))
+            if cache is not None:
+                cache.record(item, key, outputs)
+            if checkpoint is not None:
+                checkpoint.markDone(item, result)
+    finally:
+        # Also reached when the run is interrupted, so the next run resumes from here.
+        if cache is not None:
+            cache.save()
+        if checkpoint is not None:
+            checkpoint.save()
+        if log is not None:
+            log.close()
+    if checkpoint is not None:
+        checkpoint.complete()
+    if hasattr(stage, 'finish'):
+        stage.finish(items, results)
+    wallTime = time.time() - start
+
+    processed = len(tasks) - skipped
+    summary = {'stage': stageName, 'meshes': total, 'cached': skipped + resumed, 'failed': failed + quarantined, 'seconds': wallTime,
+               'throughput': processed / wallTime if wallTime > 0 else 0.0}
+    print('[{}] {} meshes ({} cached, {} failed) in {:.1f}s, {:.2f} meshes/sec with {} workers'.format(
+        stageName, total, summary['cached'], summary['failed'], wallTime, summary['throughput'], workers))
+    return summary
+
+def runPipeline(stageNames = None, workers = None, chunksize = 1, cacheDir = None, profileDir = None, **isolation):
+    # isolation: isolate, timeout, memoryLimit, checkpointDir, retryQuarantined, see runStage.
+    stageNames = stageNames if stageNames is not None else meshStages
+    summaries = [runStage(name, workers = workers, chunksize = chunksize, cacheDir = cacheDir, profileDir = profileDir, **isolation)
+                 for name in stageNames]
+
+    print('stage                      meshes   cached   failed    seconds  meshes/sec')
+    for s in summaries:
+        print('{:<25} {:>8} {:>8} {:>8} {:>10.1f} {:>11.2f}'.format(s['stage'], s['meshes'], s['cached'], s['failed'], s['seconds'], s['throughput']))
+    if profileDir is not None:
+        summarize(profileDir)
+    return summaries
@@ -0,0 +1,33 @@
+import zlib
+import numpy as np
+
+# Seeded, vectorized surface sampling.
+# The face area CDF is built once per mesh and every draw is a single searchsorted call.
+# Samples are i.i.d., so any prefix of one large draw is itself a uniform sample of the surface:
+# consumers that need 1k or 10k points read the first 1k or 10k of the 100k cloud.
+
+def meshSeed(name, seed = 0):
+    # Depends on the mesh name only, so results do not change with worker count or catalog order.
+    return zlib.crc32(name.encode()) ^ seed
+
+class SurfaceSampler(object):
+    def __init__(self, vertices, faces):
+        triangles = np.asarray(vertices, dtype=np.float64)[np.asarray(faces)]
+        self.origins = triangles[:, 0]
+        self.edges = triangles[:, 1:] - self.origins[:, None, :]
+        areas = np.linalg.norm(np.cross(self.edges[:, 0], self.edges[:, 1]), axis=1) / 2
+        self.cdf = np.cumsum(areas)
+        self.cdf /= self.cdf[-1]
+
+    def sample(self, count, seed = 0):
+        rng = np.random.default_rng(seed)
+        faceIdx = np.searchsorted(self.cdf, rng.random(count), side='right')
+        faceIdx = np.minimum(faceIdx, len(self.cdf) - 1)
+
+        uv = rng.random((count, 2))
+        outside = uv.sum(axis=1) > 1 # fold the far half of the parallelogram back into the triangle
+        uv[outside] = 1 - uv[outside]
+
+        edges = self.edges[faceIdx]
+        points = self.origins[faceIdx] + uv[:, 0:1] * edges[:, 0] + uv[:, 1:2] * edges[:, 1]
+        return points, faceIdx
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+
+# Test sequences of shape ids for the packing policy, drawn for all sequences at once.
+# The shapes are grouped the way the item creators of environment/physics0/IRcreator.py group them:
+#   pose      every posed shape is equally likely (RandomItemCreator)
+#   instance  a mesh first, then one of its poses (RandomInstanceCreator)
+#   category  a category (the sub folder of the shape) first, then one of its shapes (RandomCateCreator)
+
+def listShapes(baseDir):
+    # Shape names relative to baseDir, shapes in sub folders are named 'category/file' like in dicPath.
+    names = []
+    for folder, _, files in os.walk(baseDir):
+        for name in files:
+            names.append(os.path.relpath(os.path.join(folder, name), baseDir).replace(os.sep, '/'))
+    return sorted(names)
+
+def instanceName(shape):
+    # '<mesh>_<pose>.obj' -> '<mesh>'
+    return shape.rsplit('_', 1)[0]
+
+def categoryName(shape):
+    return shape.split('/')[0] if '/' in shape else ''
+
+def groupIds(id2shape, key):
+    # Shape ids sorted by group plus the start of every group, groups in order of first appearance.
+    ids = np.array(sorted(id2shape.keys()), dtype=np.int64)
+    labels = [key(id2shape[k]) for k in ids]
+    groups, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.argsort(np.argsort(first))[inverse]
+    order = np.argsort(rank, kind='stable')
+    counts = np.bincount(rank, minlength=len(groups))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return ids[order], starts, counts
+
+def drawFromGroups(rng, memberIds, starts, counts, shape, weights = None):
+    # A group per slot (uniform unless weights are given), then a uniform member of that group.
+    if weights is None:
+        group = rng.integers(0, len(starts), size=shape)
+    else:
+        group = rng.choice(len(starts), size=shape, p=np.asarray(weights) / np.sum(weights))
+    member = (rng.random(shape) * counts[group]).astype(np.int64)
+    return memberIds[starts[group] + member]
+
+def sampleSequences(id2shape, count, length, mode = 'instance', seed = 0, weights = None):
+    rng = np.random.default_rng(seed)
+    shape = (count, length)
+    if mode == 'pose':
+        ids = np.array(sorted(id2shape.keys()), dtype=np.int64)
+        sequences = ids[rng.integers(0, len(ids), size=shape)]
+    elif mode == 'instance':
+        sequences = drawFromGroups(rng, *groupIds(id2shape, instanceName), shape, weights)
+    elif mode == 'category':
+        sequences = drawFromGroups(rng, *groupIds(id2shape, categoryName), shape, weights)
+    else:
+        raise ValueError('unknown sampling mode {}'.format(mode))
+    return sequences.astype(np.int32)
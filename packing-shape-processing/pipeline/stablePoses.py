@@ -0,0 +1,137 @@
+import os
+import hashlib
+import numpy as np
+
+# Stable resting poses of a mesh on a plane and their quasi-static probabilities, the same model as
+# trimesh.poses.compute_stable_poses (one center of mass sample, http://goldberg.berkeley.edu/pubs/eps.pdf)
+# but evaluated for all hull facets at once:
+#   - the probability of first touching the ground with a facet is the solid angle it spans from the center of mass,
+#   - a facet whose projected center of mass falls outside topples over the edge the projection lies behind,
+#   - the probability of every facet flows along the topple links (pointer jumping) to the facet it settles on.
+# The hull can be handed in when the caller has it already, and results can be cached on disk by mesh content.
+
+def meshHash(mesh, centerMass = None, threshold = 0.0):
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(mesh.vertices, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(mesh.faces, dtype=np.int64).tobytes())
+    h.update(repr((None if centerMass is None else np.round(centerMass, 12).tolist(), threshold)).encode())
+    return h.hexdigest()
+
+def staticProbabilities(triangles, com):
+    # Spherical area of every triangle seen from com (L'Huilier), over 4 pi.
+    sv = triangles - com
+    sv /= np.linalg.norm(sv, axis=2, keepdims=True)
+    a = np.arccos(np.clip(np.einsum('ij,ij->i', sv[:, 0], sv[:, 1]), -1, 1))
+    b = np.arccos(np.clip(np.einsum('ij,ij->i', sv[:, 1], sv[:, 2]), -1, 1))
+    c = np.arccos(np.clip(np.einsum('ij,ij->i', sv[:, 2], sv[:, 0]), -1, 1))
+    s = (a + b + c) / 2
+    product = np.tan(s / 2) * np.tan((s - a) / 2) * np.tan((s - b) / 2) * np.tan((s - c) / 2)
+    return np.arctan(np.sqrt(np.maximum(product, 0))) / np.pi
+
+def _orient(pa, pb, pc, pd):
+    # Sign of pd against the plane through pa, pb, pc, row wise.
+    return np.einsum('ij,ij->i', pa - pd, np.cross(pb - pd, pc - pd))
+
+def toppleTargets(hull, com):
+    # Facet every facet settles on next: itself when it is stable.
+    faces = len(hull.faces)
+    normals = hull.face_normals
+    triangles = hull.triangles
+    target = np.arange(faces)
+
+    projDists = np.einsum('ij,ij->i', normals, com - triangles[:, 0])
+    projComs = com - projDists[:, None] * normals
+    # Barycentric coordinates of the projected center of mass, negative outside the facet.
+    e0, e1 = triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+    rel = projComs - triangles[:, 0]
+    d00, d01, d11 = np.einsum('ij,ij->i', e0, e0), np.einsum('ij,ij->i', e0, e1), np.einsum('ij,ij->i', e1, e1)
+    d20, d21 = np.einsum('ij,ij->i', rel, e0), np.einsum('ij,ij->i', rel, e1)
+    denom = d00 * d11 - d01 * d01
+    v = (d11 * d20 - d01 * d21) / denom
+    w = (d00 * d21 - d01 * d20) / denom
+    unstable = (v < 0) | (w < 0) | (1 - v - w < 0)
+
+    # Both directions of every adjacency, in the order of hull.face_adjacency.
+    pairs = hull.face_adjacency
+    edges = hull.face_adjacency_edges
+    source = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    neighbor = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    edgeVerts = np.concatenate([edges, edges])
+    order = np.argsort(np.concatenate([np.arange(len(pairs))] * 2) + np.repeat([0, 0.5], len(pairs)), kind='stable')
+    source, neighbor, edgeVerts = source[order], neighbor[order], edgeVerts[order]
+    keep = unstable[source]
+    source, neighbor, edgeVerts = source[keep], neighbor[keep], edgeVerts[keep]
+    if len(source) == 0:
+        return target
+
+    centroid = hull.triangles_center[source]
+    norm = normals[source]
+    v1, v2 = hull.vertices[edgeVerts[:, 0]], hull.vertices[edgeVerts[:, 1]]
+    swap = np.einsum('ij,ij->i', np.cross(v1 - centroid, v2 - centroid), norm) < 0
+    v1, v2 = np.where(swap[:, None], v2, v1), np.where(swap[:, None], v1, v2)
+    proj = projComs[source]
+    margin = np.minimum(_orient(centroid, v1, v1 + norm, proj), _orient(centroid, v2 + norm, v2, proj))
+
+    # The first neighbor whose wedge holds the projection, else the one closest to holding it.
+    order = np.lexsort((margin < 0, source))
+    first = order[np.concatenate([[True], source[order][1:] != source[order][:-1]])]
+    best = np.lexsort((-margin, source))
+    best = best[np.concatenate([[True], source[best][1:] != source[best][:-1]])]
+    chosen = np.where(margin[first] >= 0, first, best)
+    target[source[chosen]] = neighbor[chosen]
+    return target
+
+def settle(target, probs):
+    # Follow the topple links to their end for every facet at once.
+    for _ in range(int(np.ceil(np.log2(max(len(target), 2)))) + 1):
+        target = target[target]
+    return np.bincount(target, weights=probs, minlength=len(target))
+
+def restingTransform(normal, hullVertices):
+    # z axis against the facet normal, resting on z = 0, as trimesh builds it.
+    tf = np.eye(4)
+    z = -1.0 * normal
+    x = np.array([-z[1], z[0], 0])
+    x = np.array([1.0, 0, 0]) if np.linalg.norm(x) == 0.0 else x / np.linalg.norm(x)
+    y = np.cross(z, x)
+    y = y / np.linalg.norm(y)
+    tf[:3, :3] = np.array([x, y, z])
+    tf[2, 3] = -np.min(hullVertices @ z)
+    return tf
+
+def computeStablePoses(mesh, hull = None, centerMass = None, threshold = 0.0):
+    hull = hull if hull is not None else mesh.convex_hull
+    com = np.asarray(centerMass if centerMass is not None else mesh.center_mass, dtype=np.float64)
+    probs = settle(toppleTargets(hull, com), staticProbabilities(hull.triangles, com))
+
+    # Facets sharing a normal (to 3 decimals) are one pose, named after the first of them.
+    faces = np.flatnonzero(probs > 0)
+    _, first, inverse = np.unique(np.around(hull.face_normals[faces], decimals=3), axis=0, return_index=True, return_inverse=True)
+    groupProbs = np.bincount(inverse.reshape(-1), weights=probs[faces])
+    appearance = np.argsort(first)
+    normals = hull.face_normals[faces[first[appearance]]]
+    groupProbs = groupProbs[appearance]
+
+    keep = groupProbs > threshold
+    transforms = np.array([restingTransform(n, hull.vertices) for n in normals[keep]]).reshape(-1, 4, 4)
+    groupProbs = groupProbs[keep]
+    # Ties (up to summation noise) keep the grouping order of trimesh, the facet order of their first facet.
+    order = np.argsort(-groupProbs, kind='stable')
+    tieBlock = np.cumsum(np.concatenate([[0], -np.diff(groupProbs[order]) > 1e-12]))
+    order = order[np.lexsort((order, tieBlock))]
+    return transforms[order], groupProbs[order]
+
+def stablePoses(mesh, hull = None, centerMass = None, threshold = 0.0, cacheDir = None):
+    # computeStablePoses behind an on-disk cache keyed by the mesh content.
+    if cacheDir is None:
+        return computeStablePoses(mesh, hull, centerMass, threshold)
+    cachePath = os.path.join(cacheDir, meshHash(mesh, centerMass, threshold) + '.npz')
+    if os.path.exists(cachePath):
+        cached = np.load(cachePath)
+        return cached['transforms'], cached['probs']
+    transforms, probs = computeStablePoses(mesh, hull, centerMass, threshold)
+    os.makedirs(cacheDir, exist_ok=True)
+    tmpPath = cachePath + '.{}.tmp.npz'.format(os.getpid())
+    np.savez(tmpPath, transforms=transforms, probs=probs)
+    os.replace(tmpPath, cachePath)
+    return transforms, probs
@@ -0,0 +1,64 @@
+import os
+import shutil
+import numpy as np
+import pybullet as p
+from .buildCache import fileHash, paramsHash
+
+# Convex decomposition service shared by 3_4_vhacd.py and 3_6_vhacd_with_poses.py.
+# Results of p.vhacd are cached by (input content hash, V-HACD parameters), and decompositions
+# are moved rigidly or rescaled by rewriting the vertex records of the OBJ, which keeps the
+# one-object-per-convex-part layout PyBullet needs for compound collision shapes.
+
+def readObj(path):
+    with open(path, 'r') as f:
+        lines = f.readlines()
+    vertexLines = [idx for idx, line in enumerate(lines) if line.startswith('v ')]
+    vertices = np.array([lines[idx].split()[1:4] for idx in vertexLines], dtype=np.float64).reshape(-1, 3)
+    return lines, vertexLines, vertices
+
+def objParts(path):
+    # Vertices of every object (convex part) of a V-HACD OBJ, the parts PyBullet turns into a compound.
+    lines, vertexLines, vertices = readObj(path)
+    objectLines = [idx for idx, line in enumerate(lines) if line.startswith('o ')]
+    starts = np.searchsorted(vertexLines, objectLines).tolist()
+    bounds = sorted(set([0] + starts + [len(vertices)]))
+    return [vertices[start:end] for start, end in zip(bounds[0:-1], bounds[1:]) if end > start]
+
+def objScale(path):
+    # Same as trimesh's .scale, the length of the bounding box diagonal.
+    _, _, vertices = readObj(path)
+    return np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0))
+
+def objCenter(path):
+    # Center of the bounding box.
+    _, _, vertices = readObj(path)
+    return (vertices.max(axis=0) + vertices.min(axis=0)) / 2
+
+def transformObj(source, target, T):
+    lines, vertexLines, vertices = readObj(source)
+    vertices = np.dot(vertices, T[0:3, 0:3].T) + T[0:3, 3]
+    for idx, v in zip(vertexLines, vertices):
+        lines[idx] = 'v {:.8f} {:.8f} {:.8f}\n'.format(*v)
+    tmpPath = target + '.{}.tmp'.format(os.getpid())
+    with open(tmpPath, 'w') as f:
+        f.writelines(lines)
+    os.replace(tmpPath, target)
+
+def decompose(source, target, params = None, cacheDir = None, log = ''):
+    # p.vhacd(source, target) with a content addressed result cache.
+    params = params if params is not None else {}
+    if cacheDir is None:
+        p.vhacd(source, target, log, **params)
+        return False
+
+    os.makedirs(cacheDir, exist_ok=True)
+    cached = os.path.join(cacheDir, '{}_{}.obj'.format(fileHash(source), paramsHash(params)[0:12]))
+    if os.path.exists(cached):
+        shutil.copyfile(cached, target)
+        return True
+
+    tmpPath = cached + '.{}.tmp.obj'.format(os.getpid())
+    p.vhacd(source, tmpPath, log, **params)
+    shutil.copyfile(tmpPath, target)
+    os.replace(tmpPath, cached)
+    return False
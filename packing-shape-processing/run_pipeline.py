@@ -0,0 +1,30 @@
+import argparse
+from pipeline import runPipeline
+from pipeline.runner import meshStages
+
+# Run the numbered per-mesh stages over a process pool instead of one script at a time.
+# e.g. python run_pipeline.py --stages 3_1_meshdownsample 3_4_vhacd --workers 32
+
+parser = argparse.ArgumentParser(description='Shape processing pipeline driver')
+parser.add_argument('--stages', nargs='+', default=meshStages, help='Numbered stages to run, in order')
+parser.add_argument('--workers', type=int, default=None, help='Pool size, defaults to the number of cores')
+parser.add_argument('--chunksize', type=int, default=1, help='Meshes handed to a worker at a time')
+parser.add_argument('--cache', type=str, default='./build_cache', help='Directory holding the per-stage build manifests')
+parser.add_argument('--no-cache', action='store_true', help='Rebuild every mesh regardless of the manifests')
+parser.add_argument('--profile', type=str, default='./build_profile', help='Directory holding the per-mesh timing logs')
+parser.add_argument('--no-profile', action='store_true', help='Do not write timing logs')
+parser.add_argument('--isolate', action='store_true', help='Watch every worker, checkpoint progress and quarantine failing meshes')
+parser.add_argument('--timeout', type=float, default=None, help='Seconds one mesh may take in --isolate mode')
+parser.add_argument('--memory', type=float, default=None, help='Resident MB a worker may use in --isolate mode')
+parser.add_argument('--checkpoint', type=str, default='./build_cache', help='Directory holding checkpoints and quarantine lists')
+parser.add_argument('--retry-quarantined', action='store_true', help='Try the quarantined meshes again')
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    cacheDir = None if args.no_cache else args.cache
+    profileDir = None if args.no_profile else args.profile
+    isolation = {}
+    if args.isolate:
+        isolation = {'isolate': True, 'timeout': args.timeout, 'checkpointDir': args.checkpoint, 'retryQuarantined': args.retry_quarantined,
+                     'memoryLimit': args.memory * 2 ** 20 if args.memory is not None else None}
+    runPipeline(args.stages, workers=args.workers, chunksize=args.chunksize, cacheDir=cacheDir, profileDir=profileDir, **isolation)